@@ -1,5 +1,5 @@
-from backend.agent.graph import create_agent_graph
+from backend.agent.graph import compiled_agent, create_agent_graph
 from backend.agent.state import AgentState
 from backend.agent.tools import ALL_TOOLS
 
-__all__ = ["AgentState", "ALL_TOOLS", "create_agent_graph"]
+__all__ = ["AgentState", "ALL_TOOLS", "compiled_agent", "create_agent_graph"]
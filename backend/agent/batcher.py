@@ -0,0 +1,91 @@
+import asyncio
+import logging
+
+from backend.models.database import async_session, DiscrepancyRecord
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 50
+MAX_BATCH_DELAY_SECONDS = 0.1
+
+
+class DiscrepancyBatcher:
+    """Coalesces DiscrepancyRecord inserts from concurrent tool calls into batched commits.
+
+    A background task collects queued records until MAX_BATCH_SIZE are waiting
+    or MAX_BATCH_DELAY_SECONDS have passed since the first one, then writes them
+    with a single session and commit.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_delay: float = MAX_BATCH_DELAY_SECONDS,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+
+    async def submit(self, record: DiscrepancyRecord) -> None:
+        """Queue a record and wait until the batch containing it is committed.
+
+        Raises:
+            Exception: Whatever the batch commit raised.
+        """
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future))
+        await future
+
+    async def close(self) -> None:
+        """Flush any queued records and stop the background task."""
+        if self._worker is None or self._worker.done():
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[tuple[DiscrepancyRecord, asyncio.Future]]) -> None:
+        try:
+            async with async_session() as session:
+                session.add_all([record for record, _ in batch])
+                await session.commit()
+        except Exception as e:
+            logger.error("Failed to write %d discrepancy records: %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+discrepancy_batcher = DiscrepancyBatcher()
@@ -2,7 +2,7 @@ from langgraph.graph import END, START, StateGraph
 
 from backend.agent.nodes import (
     classify_query,
-    execute_step,
+    execute_level,
     plan,
     retrieve,
     route_after_classify,
@@ -17,7 +17,12 @@ def create_agent_graph():
 
     Flow:
         START -> classify -> (simple) -> retrieve -> synthesize -> END
-                          -> (complex) -> plan -> execute_step(s) -> synthesize -> END
+                          -> (complex) -> [plan] -> execute_level(s) -> synthesize -> END
+
+    Classification also plans complex queries in the same LLM call; the plan
+    node only runs when that response came back without steps.
+
+    Each execute_level runs the independent steps of one plan level concurrently.
     """
     graph = StateGraph(AgentState)
 
@@ -25,7 +30,7 @@ def create_agent_graph():
     graph.add_node("classify", classify_query)
     graph.add_node("plan", plan)
     graph.add_node("retrieve", retrieve)
-    graph.add_node("execute_step", execute_step)
+    graph.add_node("execute_level", execute_level)
     graph.add_node("synthesize", synthesize)
 
     # Add edges
@@ -33,15 +38,20 @@ def create_agent_graph():
     graph.add_conditional_edges(
         "classify",
         route_after_classify,
-        {"retrieve": "retrieve", "plan": "plan"},
+        {"retrieve": "retrieve", "plan": "plan", "execute_level": "execute_level"},
     )
     graph.add_edge("retrieve", "synthesize")
-    graph.add_edge("plan", "execute_step")
+    graph.add_edge("plan", "execute_level")
     graph.add_conditional_edges(
-        "execute_step",
+        "execute_level",
         route_after_execute,
-        {"execute_step": "execute_step", "synthesize": "synthesize"},
+        {"execute_level": "execute_level", "synthesize": "synthesize"},
     )
     graph.add_edge("synthesize", END)
 
     return graph.compile()
+
+
+# Compiled once at import and shared by every request; the compiled graph
+# holds no per-run state.
+compiled_agent = create_agent_graph()
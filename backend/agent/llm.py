@@ -0,0 +1,20 @@
+from functools import lru_cache
+
+from langchain_anthropic import ChatAnthropic
+
+from backend.config import get_settings
+
+
+@lru_cache(maxsize=4)
+def _build_llm(model: str, api_key: str) -> ChatAnthropic:
+    return ChatAnthropic(model=model, api_key=api_key, temperature=0)
+
+
+def get_llm() -> ChatAnthropic:
+    """Return the shared LLM instance for the configured model.
+
+    Instances are memoized on (model, api_key) so the Anthropic client and its
+    HTTP connection pool are reused across nodes, tools and requests.
+    """
+    settings = get_settings()
+    return _build_llm(settings.default_llm, settings.anthropic_api_key)
@@ -0,0 +1,119 @@
+"""Response cache for deterministic (temperature=0) LLM calls.
+
+Two tiers:
+    - exact: keyed on a SHA-256 of the model and the full message list.
+    - semantic: per-namespace store of (unit embedding, response); a miss on
+      the exact tier is answered from here when the new text embeds within
+      ``threshold`` cosine similarity of a cached one.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Any
+
+import numpy as np
+from langchain_core.messages import BaseMessage
+
+from backend.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 1024
+CACHE_TTL_SECONDS = 6 * 60 * 60
+SEMANTIC_THRESHOLD = 0.95
+
+
+def cache_key(model: str, messages: list[BaseMessage]) -> str:
+    """Build the exact-tier key for a model and message list."""
+    payload = {
+        "model": model,
+        "messages": [[message.type, message.content] for message in messages],
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class LLMResponseCache:
+    """In-memory LRU response cache with an optional semantic tier."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], Sequence[float]],
+        maxsize: int = CACHE_SIZE,
+        ttl: float = CACHE_TTL_SECONDS,
+        threshold: float = SEMANTIC_THRESHOLD,
+    ):
+        """
+        Args:
+            embed: Synchronous text -> vector function used by the semantic tier.
+            maxsize: Maximum entries per tier (and per semantic namespace).
+            ttl: Entry lifetime in seconds.
+            threshold: Minimum cosine similarity for a semantic hit.
+        """
+        self._embed = embed
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._exact = LRUCache(maxsize, ttl)
+        self._semantic: dict[str, LRUCache] = {}
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        namespace: str | None = None,
+        semantic_text: str | None = None,
+        semantic_filter: Callable[[Any], bool] | None = None,
+    ) -> Any:
+        """Return the cached response for key, computing and storing it on a miss.
+
+        Args:
+            key: Exact-tier key, usually from :func:`cache_key`.
+            compute: Zero-argument coroutine factory producing the response.
+            namespace: Semantic-tier partition (e.g. model + node name). Only
+                texts within the same namespace are compared.
+            semantic_text: Text to embed for the semantic tier; None skips it.
+            semantic_filter: Optional predicate; only computed responses it
+                accepts are stored in the semantic tier.
+        """
+        value = self._exact.get(key)
+        if value is not None:
+            return value
+
+        vector = None
+        if namespace is not None and semantic_text is not None:
+            vector = await asyncio.to_thread(self._unit_vector, semantic_text)
+            value = self._semantic_lookup(namespace, vector)
+            if value is not None:
+                logger.info("Semantic LLM cache hit in %s", namespace)
+                self._exact.set(key, value)
+                return value
+
+        value = await compute()
+        self._exact.set(key, value)
+        if vector is not None and (semantic_filter is None or semantic_filter(value)):
+            store = self._semantic.setdefault(namespace, LRUCache(self.maxsize, self.ttl))
+            store.set(key, (vector, value))
+        return value
+
+    def _unit_vector(self, text: str) -> np.ndarray:
+        vector = np.asarray(self._embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _semantic_lookup(self, namespace: str, vector: np.ndarray) -> Any:
+        store = self._semantic.get(namespace)
+        if not store:
+            return None
+        entries = list(store.values())
+        if not entries:
+            return None
+        similarities = np.stack([v for v, _ in entries]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.threshold:
+            return entries[best][1]
+        return None
@@ -1,85 +1,225 @@
-import json
+import asyncio
+import re
+from collections.abc import Callable
+from functools import lru_cache
 
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
+from backend.agent.llm import get_llm
+from backend.agent.llm_cache import LLMResponseCache, cache_key
 from backend.agent.prompts import (
-    CLASSIFICATION_PROMPT,
+    CLASSIFY_AND_PLAN_PROMPT,
     PLANNING_PROMPT,
     SYNTHESIS_PROMPT,
     SYSTEM_PROMPT,
 )
 from backend.agent.state import AgentState
-from backend.agent.tools import ALL_TOOLS
-from backend.config import get_settings
+from backend.agent.tools import (
+    ALL_TOOLS,
+    TOOLS_BY_NAME,
+    embed_query,
+    format_search_result,
+    search_many,
+)
 
+_llm_cache = LLMResponseCache(embed=embed_query)
+
+# Shared, byte-identical system prefix marked for Anthropic prompt caching.
+# The marker caches everything up to it (bound tool definitions included),
+# and only takes effect once that prefix reaches the model's minimum
+# cacheable length.
+_SYSTEM_MESSAGE = SystemMessage(content=[
+    {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}},
+])
+
+
+def _split_template(template: str, *fields: str) -> tuple[str, ...]:
+    """Split a str.format template into the literal text around its fields.
+
+    Each field must appear exactly once, in the given order. Interleaving the
+    parts with the field values gives the same string as template.format(),
+    without re-parsing the template on every call.
+    """
+    markers = {field: f"\x00{field}\x00" for field in fields}
+    rest = template.format(**markers)
+    parts = []
+    for field in fields:
+        head, rest = rest.split(markers[field])
+        parts.append(head)
+    parts.append(rest)
+    return tuple(parts)
+
+
+_CLASSIFY_PREFIX, _CLASSIFY_SUFFIX = _split_template(CLASSIFY_AND_PLAN_PROMPT, "query")
+_PLAN_PREFIX, _PLAN_SUFFIX = _split_template(PLANNING_PROMPT, "query")
+_SYNTHESIS_PREFIX, _SYNTHESIS_MIDDLE, _SYNTHESIS_SUFFIX = _split_template(
+    SYNTHESIS_PROMPT, "query", "step_results"
+)
 
-def _get_llm():
-    """Create and return the configured LLM instance."""
-    settings = get_settings()
-    from langchain_anthropic import ChatAnthropic
 
-    return ChatAnthropic(
-        model=settings.default_llm,
-        api_key=settings.anthropic_api_key,
-        temperature=0,
+@lru_cache(maxsize=1)
+def _llm_with_tools():
+    """The shared LLM with ALL_TOOLS bound; tool_choice="any" forces a tool call."""
+    return get_llm().bind_tools(ALL_TOOLS, tool_choice="any")
+
+
+async def _astream(runnable, messages: list[BaseMessage]) -> AIMessage:
+    """Stream a completion and return it as one message.
+
+    Tokens reach ``graph.astream(stream_mode="messages")`` consumers as they
+    are generated.
+    """
+    response = None
+    async for chunk in runnable.astream(messages):
+        response = chunk if response is None else response + chunk
+    if response is None:
+        return AIMessage(content="")
+    # Keep the streamed id so langgraph doesn't emit the finished message again
+    return AIMessage(content=response.content, id=response.id)
+
+
+async def _ainvoke(
+    node: str,
+    messages: list[BaseMessage],
+    semantic_text: str | None = None,
+    semantic_filter: Callable[[AIMessage], bool] | None = None,
+    with_tools: bool = False,
+    stream: bool = False,
+) -> AIMessage:
+    """Invoke the LLM, serving repeated temperature=0 prompts from the response cache.
+
+    With stream=True the completion is generated token by token; cache hits
+    return the whole message at once.
+    """
+    llm = get_llm()
+    runnable = _llm_with_tools() if with_tools else llm
+    call = _astream if stream else lambda r, m: r.ainvoke(m)
+    if llm.temperature != 0:
+        return await call(runnable, messages)
+    model_key = f"{llm.model}+tools" if with_tools else llm.model
+    return await _llm_cache.get_or_compute(
+        cache_key(model_key, messages),
+        lambda: call(runnable, messages),
+        namespace=f"{llm.model}:{node}",
+        semantic_text=semantic_text,
+        semantic_filter=semantic_filter,
     )
 
 
-def classify_query(state: AgentState) -> dict:
-    """Classify query as simple or complex using LLM."""
-    llm = _get_llm()
-    prompt = CLASSIFICATION_PROMPT.format(query=state["query"])
-    response = llm.invoke([
-        SystemMessage(content=SYSTEM_PROMPT),
-        HumanMessage(content=prompt),
-    ])
-    classification = response.content.strip().lower()
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def _parse_json(text: str):
+    """Parse a JSON LLM response, tolerating a surrounding ```json fence."""
+    return orjson.loads(_FENCE_RE.sub("", text))
+
+
+def _parse_classification(content: str) -> tuple[str, list | None, list | None]:
+    """Parse the classify-and-plan response into (classification, steps, levels)."""
+    try:
+        parsed = _parse_json(content)
+    except orjson.JSONDecodeError:
+        parsed = {"classification": content}
+    if not isinstance(parsed, dict):
+        parsed = {}
+
+    classification = str(parsed.get("classification", "")).strip().lower()
     if classification not in ("simple", "complex"):
         classification = "simple"
+    steps = parsed.get("steps")
+    if not isinstance(steps, list) or not steps:
+        steps = None
+    return classification, steps, parsed.get("levels")
+
+
+def _is_simple(response: AIMessage) -> bool:
+    """Only plan-free "simple" verdicts are safe to reuse for similar queries."""
+    return _parse_classification(response.content)[0] == "simple"
+
+
+def _plan_levels(levels, step_count: int) -> list[list[int]]:
+    """Validate LLM-proposed execution levels, falling back to one step per level.
 
+    A valid plan lists every step index exactly once, in topological order:
+    steps in the same level are independent and may run concurrently.
+    """
+    sequential = [[i] for i in range(step_count)]
+    if not isinstance(levels, list) or not all(isinstance(level, list) and level for level in levels):
+        return sequential
+    flat = [i for level in levels for i in level]
+    if not all(isinstance(i, int) for i in flat) or sorted(flat) != list(range(step_count)):
+        return sequential
+    return levels
+
+
+def _plan_update(steps: list, levels) -> dict:
+    levels = _plan_levels(levels, len(steps))
     thinking_step = {
-        "step": "classify",
-        "description": f"Classified query as '{classification}'",
-        "detail": f"Query: {state['query']}",
+        "step": "plan",
+        "description": f"Created plan with {len(steps)} steps in {len(levels)} levels",
+        "detail": steps,
     }
     return {
-        "classification": classification,
+        "plan_steps": steps,
+        "plan_levels": levels,
+        "current_level": 0,
         "thinking_steps": [thinking_step],
     }
 
 
-def plan(state: AgentState) -> dict:
-    """Break complex query into sub-tasks."""
-    llm = _get_llm()
-    prompt = PLANNING_PROMPT.format(query=state["query"])
-    response = llm.invoke([
-        SystemMessage(content=SYSTEM_PROMPT),
+async def classify_query(state: AgentState) -> dict:
+    """Classify the query and, if complex, plan it in the same LLM call."""
+    prompt = _CLASSIFY_PREFIX + state["query"] + _CLASSIFY_SUFFIX
+    response = await _ainvoke("classify", [
+        _SYSTEM_MESSAGE,
+        HumanMessage(content=prompt),
+    ], semantic_text=state["query"], semantic_filter=_is_simple)
+    classification, steps, levels = _parse_classification(response.content)
+
+    thinking_step = {
+        "step": "classify",
+        "description": f"Classified query as '{classification}'",
+        "detail": f"Query: {state['query']}",
+    }
+    update = {"classification": classification}
+    if classification == "complex" and steps:
+        update.update(_plan_update(steps, levels))
+    update["thinking_steps"] = [thinking_step, *update.get("thinking_steps", [])]
+    return update
+
+
+async def plan(state: AgentState) -> dict:
+    """Break complex query into sub-tasks grouped into dependency levels.
+
+    Only reached when the classification response did not include a plan.
+    """
+    prompt = _PLAN_PREFIX + state["query"] + _PLAN_SUFFIX
+    response = await _ainvoke("plan", [
+        _SYSTEM_MESSAGE,
         HumanMessage(content=prompt),
     ])
 
+    levels = None
     try:
-        steps = json.loads(response.content)
+        parsed = _parse_json(response.content)
+        if isinstance(parsed, dict):
+            steps = parsed.get("steps")
+            levels = parsed.get("levels")
+        else:
+            steps = parsed
         if not isinstance(steps, list):
             steps = [response.content.strip()]
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         steps = [line.strip().lstrip("- ") for line in response.content.strip().split("\n") if line.strip()]
 
-    thinking_step = {
-        "step": "plan",
-        "description": f"Created plan with {len(steps)} steps",
-        "detail": steps,
-    }
-    return {
-        "plan_steps": steps,
-        "current_step": 0,
-        "thinking_steps": [thinking_step],
-    }
+    return _plan_update(steps, levels)
 
 
-def retrieve(state: AgentState) -> dict:
+async def retrieve(state: AgentState) -> dict:
     """Simple retrieval for factual queries using vector search."""
-    tool = ALL_TOOLS[0]  # vector_search
-    result = tool.invoke({"query": state["query"]})
+    tool = TOOLS_BY_NAME["vector_search"]
+    result = await tool.ainvoke({"query": state["query"]})
 
     thinking_step = {
         "step": "retrieve",
@@ -87,70 +227,118 @@ def retrieve(state: AgentState) -> dict:
         "detail": state["query"],
     }
     return {
-        "tool_results": [{"tool": "vector_search", "result": result}],
+        "tool_results": [{"tool": "vector_search", "args": {"query": state["query"]}, "result": result}],
         "thinking_steps": [thinking_step],
     }
 
 
-def execute_step(state: AgentState) -> dict:
-    """Execute the current step in the plan."""
-    current_idx = state["current_step"]
-    step_description = state["plan_steps"][current_idx]
-
-    tool_map = {name: t for t in ALL_TOOLS for name in [t.name]}
-
-    llm = _get_llm()
-    tool_selection_prompt = (
-        f"Given this sub-task: \"{step_description}\"\n"
-        f"Available tools: {', '.join(tool_map.keys())}\n"
-        "Respond with a JSON object: {{\"tool\": \"tool_name\", \"args\": {{...}}}}\n"
-        "Use only valid tool names and appropriate arguments."
+async def _select_tool_calls(step_description: str) -> list[tuple[str, dict]]:
+    """Let the LLM pick tools for one plan step via native tool use.
+
+    A response without usable tool calls falls back to a vector search on
+    the step description.
+    """
+    response = await _ainvoke("execute_step", [
+        _SYSTEM_MESSAGE,
+        HumanMessage(content=f"Complete this sub-task using the available tools: {step_description}"),
+    ], with_tools=True)
+    return [
+        (call["name"], call["args"])
+        for call in response.tool_calls
+        if call["name"] in TOOLS_BY_NAME
+    ] or [("vector_search", {"query": step_description})]
+
+
+def _search_group(args: dict) -> tuple[int, str | None] | None:
+    """Return the (n_results, doc_type) batch key for a plain vector_search call."""
+    if set(args) - {"query", "n_results", "doc_type"} or not isinstance(args.get("query"), str):
+        return None
+    n_results = args.get("n_results", 5)
+    doc_type = args.get("doc_type")
+    if not isinstance(n_results, int) or not (doc_type is None or isinstance(doc_type, str)):
+        return None
+    return n_results, doc_type
+
+
+async def _run_tool_calls(calls: list[tuple[str, dict]]) -> list[str]:
+    """Run tool calls concurrently, returning their results in order.
+
+    vector_search calls sharing n_results and doc_type are coalesced into a
+    single batched search: one embedding call and one Chroma query.
+    """
+    results: list[str | None] = [None] * len(calls)
+    searches: dict[tuple, list[int]] = {}
+    singles: list[int] = []
+    for i, (name, args) in enumerate(calls):
+        group = _search_group(args) if name == "vector_search" else None
+        if group is None:
+            singles.append(i)
+        else:
+            searches.setdefault(group, []).append(i)
+
+    async def run_single(i: int) -> None:
+        name, args = calls[i]
+        results[i] = await TOOLS_BY_NAME[name].ainvoke(args)
+
+    async def run_searches(group: tuple[int, str | None], indexes: list[int]) -> None:
+        queries = [calls[i][1]["query"] for i in indexes]
+        found = await search_many(queries, *group)
+        for i, query, chunks in zip(indexes, queries, found):
+            results[i] = format_search_result(query, chunks)
+
+    for group, indexes in list(searches.items()):
+        if len(indexes) == 1:
+            singles.extend(searches.pop(group))
+
+    await asyncio.gather(
+        *(run_single(i) for i in singles),
+        *(run_searches(group, indexes) for group, indexes in searches.items()),
     )
-    response = llm.invoke([
-        SystemMessage(content=SYSTEM_PROMPT),
-        HumanMessage(content=tool_selection_prompt),
-    ])
-
-    try:
-        tool_call = json.loads(response.content)
-        tool_name = tool_call.get("tool", "vector_search")
-        tool_args = tool_call.get("args", {"query": step_description})
-    except (json.JSONDecodeError, AttributeError):
-        tool_name = "vector_search"
-        tool_args = {"query": step_description}
-
-    selected_tool = tool_map.get(tool_name, ALL_TOOLS[0])
-    result = selected_tool.invoke(tool_args)
-
-    thinking_step = {
-        "step": f"execute_step_{current_idx}",
-        "description": f"Step {current_idx + 1}: {step_description}",
-        "detail": {"tool": tool_name, "args": tool_args},
-    }
+    return results
+
+
+async def execute_level(state: AgentState) -> dict:
+    """Execute all steps of the current plan level concurrently."""
+    current_level = state["current_level"]
+    level = state["plan_levels"][current_level]
+    steps = [state["plan_steps"][i] for i in level]
+
+    selections = await asyncio.gather(*(_select_tool_calls(step) for step in steps))
+    results = iter(await _run_tool_calls([call for calls in selections for call in calls]))
+
+    tool_results = []
+    thinking_steps = []
+    for index, step_description, calls in zip(level, steps, selections):
+        for name, args in calls:
+            tool_results.append({"tool": name, "args": args, "step": step_description, "result": next(results)})
+        thinking_steps.append({
+            "step": f"execute_step_{index}",
+            "description": f"Step {index + 1}: {step_description}",
+            "detail": {"tool_calls": [{"tool": name, "args": args} for name, args in calls]},
+        })
     return {
-        "tool_results": [{"tool": tool_name, "step": step_description, "result": result}],
-        "current_step": current_idx + 1,
-        "thinking_steps": [thinking_step],
+        "tool_results": tool_results,
+        "current_level": current_level + 1,
+        "thinking_steps": thinking_steps,
     }
 
 
-def synthesize(state: AgentState) -> dict:
-    """Combine all results into a cited answer."""
-    llm = _get_llm()
-
-    step_results_text = ""
-    for i, tr in enumerate(state.get("tool_results", []), 1):
-        step_desc = tr.get("step", tr.get("tool", f"Step {i}"))
-        step_results_text += f"\n--- Step {i}: {step_desc} ---\n{tr['result']}\n"
+async def synthesize(state: AgentState) -> dict:
+    """Combine all results into a cited answer, streaming it as it is written."""
+    step_results_text = "".join(
+        f"\n--- Step {i}: {tr.get('step', tr.get('tool', f'Step {i}'))} ---\n{tr['result']}\n"
+        for i, tr in enumerate(state.get("tool_results", []), 1)
+    )
 
-    prompt = SYNTHESIS_PROMPT.format(
-        query=state["query"],
-        step_results=step_results_text,
+    prompt = (
+        _SYNTHESIS_PREFIX + state["query"]
+        + _SYNTHESIS_MIDDLE + step_results_text
+        + _SYNTHESIS_SUFFIX
     )
-    response = llm.invoke([
-        SystemMessage(content=SYSTEM_PROMPT),
+    response = await _ainvoke("synthesize", [
+        _SYSTEM_MESSAGE,
         HumanMessage(content=prompt),
-    ])
+    ], stream=True)
 
     thinking_step = {
         "step": "synthesize",
@@ -159,7 +347,7 @@ def synthesize(state: AgentState) -> dict:
     }
     return {
         "final_answer": response.content,
-        "messages": [AIMessage(content=response.content)],
+        "messages": [response],
         "thinking_steps": [thinking_step],
     }
 
@@ -167,12 +355,15 @@ def synthesize(state: AgentState) -> dict:
 # --- Router functions ---
 
 def route_after_classify(state: AgentState) -> str:
-    """Route to 'retrieve' for simple or 'plan' for complex."""
-    return "retrieve" if state.get("classification") == "simple" else "plan"
+    """Route to 'retrieve' for simple queries; complex queries go straight to
+    'execute_level' when classification already produced a plan, else 'plan'."""
+    if state.get("classification") == "simple":
+        return "retrieve"
+    return "execute_level" if state.get("plan_steps") else "plan"
 
 
 def route_after_execute(state: AgentState) -> str:
-    """Check if more steps remain in the plan."""
-    if state["current_step"] >= len(state["plan_steps"]):
+    """Check if more levels remain in the plan."""
+    if state["current_level"] >= len(state["plan_levels"]):
         return "synthesize"
-    return "execute_step"
+    return "execute_level"
@@ -9,16 +9,40 @@ Key guidelines:
 - Flag any discrepancies or anomalies you notice.
 - If data is insufficient to answer confidently, say so explicitly."""
 
-CLASSIFICATION_PROMPT = """Analyze the following user query and classify it as one of:
+CLASSIFY_AND_PLAN_PROMPT = """Analyze the following user query and classify it as one of:
 - "simple": A direct factual question answerable from a single document lookup \
 (e.g., "What is the total on invoice #1234?", "Who is the vendor on this bill?").
 - "complex": Requires multiple steps, comparisons across documents, calculations, \
 aggregations, or report generation (e.g., "Compare all invoices from Q3 against bank \
 statements", "Generate a GST summary for last quarter").
 
+If the query is complex, also break it down into a sequence of specific sub-tasks. \
+Each sub-task should map to one of the available tools:
+
+Available tools:
+- vector_search: Search financial documents using semantic similarity
+- sql_query: Query the financial metadata database using natural language
+- calculate: Perform financial calculations with decimal precision
+- compare_documents: Cross-reference documents to find discrepancies
+- generate_report: Generate structured financial reports
+- export_data: Export results to CSV or PDF
+- flag_discrepancy: Flag a financial discrepancy
+
 User query: {query}
 
-Respond with ONLY the word "simple" or "complex"."""
+Respond with ONLY a JSON object with these fields:
+- "classification": "simple" or "complex".
+- "steps": for complex queries, an array of short, actionable step descriptions that \
+each map to exactly one tool; null for simple queries.
+- "levels": for complex queries, the steps grouped into execution levels as arrays of \
+step indexes (0-based). Steps in the same level must not depend on each other's \
+results; every step appears in exactly one level, after the levels of any steps it \
+depends on. null for simple queries.
+
+Examples:
+{{"classification": "simple", "steps": null, "levels": null}}
+{{"classification": "complex", "steps": ["Search for all Q3 invoices", \
+"Query total amounts by vendor", "Calculate variance"], "levels": [[0, 1], [2]]}}"""
 
 PLANNING_PROMPT = """You are a financial analysis planner. Break down this complex \
 financial query into a sequence of specific sub-tasks. Each sub-task should map to \
@@ -35,9 +59,16 @@ Available tools:
 
 User query: {query}
 
-Return a JSON array of step descriptions. Each step should be a short, actionable \
-instruction that maps to exactly one tool. Example:
-["Search for all Q3 invoices", "Query total amounts by vendor", "Calculate variance"]"""
+Return a JSON object with two fields:
+- "steps": an array of step descriptions. Each step should be a short, actionable \
+instruction that maps to exactly one tool.
+- "levels": the steps grouped into execution levels, as arrays of step indexes \
+(0-based). Steps in the same level must not depend on each other's results; every \
+step appears in exactly one level, after the levels of any steps it depends on.
+
+Example:
+{{"steps": ["Search for all Q3 invoices", "Query total amounts by vendor", \
+"Calculate variance"], "levels": [[0, 1], [2]]}}"""
 
 SYNTHESIS_PROMPT = """Synthesize the results from all the steps below into a clear, \
 accurate, and well-structured answer to the user's original query.
@@ -1,16 +1,44 @@
+import operator
 from typing import TypedDict, Annotated, Literal
 
+import orjson
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
 
+def _call_key(tool_result: dict) -> tuple | None:
+    if "args" not in tool_result:
+        return None
+    args = orjson.dumps(tool_result["args"], option=orjson.OPT_SORT_KEYS, default=str)
+    return tool_result.get("tool"), args
+
+
+def merge_tool_results(left: list[dict], right: list[dict]) -> list[dict]:
+    """Append new tool results, skipping calls (same tool and args) already recorded.
+
+    Repeated calls across plan levels return the same data, so keeping one
+    copy avoids feeding it to synthesis twice. Neither input is mutated.
+    """
+    seen = {key for key in map(_call_key, left) if key is not None}
+    merged = list(left)
+    for tool_result in right:
+        key = _call_key(tool_result)
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        merged.append(tool_result)
+    return merged
+
+
 class AgentState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     query: str
     classification: Literal["simple", "complex"] | None
     plan_steps: list[str]
-    current_step: int
-    tool_results: list[dict]
+    plan_levels: list[list[int]]
+    current_level: int
+    tool_results: Annotated[list[dict], merge_tool_results]
     final_answer: str | None
     citations: list[dict]
-    thinking_steps: list[dict]
+    thinking_steps: Annotated[list[dict], operator.add]
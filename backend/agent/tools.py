@@ -1,52 +1,127 @@
-import json
+import ast
 import asyncio
 import logging
+import operator
+import threading
 import uuid
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, InvalidOperation
+from functools import lru_cache, partial
+from itertools import combinations
 from pathlib import Path
 
+import orjson
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
-from sqlalchemy import text
+from sqlalchemy import select, text
 
-from backend.config import get_settings
+from backend.agent.batcher import discrepancy_batcher
+from backend.agent.llm import get_llm
+from backend.cache import LRUCache
 from backend.models.database import async_session, Document, DiscrepancyRecord
-from backend.pipeline.embedder import DocumentEmbedder
+from backend.pipeline.embedder import get_embedder
 from backend.reports.generator import ReportGenerator
 
 logger = logging.getLogger(__name__)
 
+# Chroma's HTTP client and the embedding model are blocking; their calls run
+# here so concurrent plan steps cannot flood the default executor.
+_SYNC_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-tools")
+
+
+def _json_default(obj):
+    """orjson fallback: RowMappings become dicts, anything else (Decimal, ...) a string."""
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    return str(obj)
+
+
+def _dumps(obj) -> str:
+    """Serialize a tool result as compact JSON."""
+    return orjson.dumps(obj, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+_query_embeddings = LRUCache(maxsize=2048)
+_query_embeddings_lock = threading.Lock()
+
+
+def embed_queries(queries: list[str]) -> list[tuple[float, ...]]:
+    """Embed search queries, reusing vectors for repeated queries.
+
+    Queries missing from the cache are embedded together in one model call.
+    Entries are keyed on the embedding model too, so switching models never
+    serves a vector from the old one.
+    """
+    embedder = get_embedder()
+    keys = [(embedder.model_name, query) for query in queries]
+    with _query_embeddings_lock:
+        vectors = {key: _query_embeddings.get(key) for key in keys}
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        embedded = embedder.embed_queries([query for _, query in missing])
+        with _query_embeddings_lock:
+            for key, vector in zip(missing, embedded):
+                vectors[key] = tuple(vector)
+                _query_embeddings.set(key, vectors[key])
+    return [vectors[key] for key in keys]
+
+
+def embed_query(query: str) -> tuple[float, ...]:
+    return embed_queries([query])[0]
+
+
+@lru_cache(maxsize=1)
+def _report_generator() -> ReportGenerator:
+    return ReportGenerator()
+
+
+def _search_many(queries: list[str], n_results: int, doc_type: str | None) -> list[list[dict]]:
+    filters = {"doc_type": doc_type} if doc_type else None
+    return get_embedder().search_many(
+        queries,
+        n_results=n_results,
+        filters=filters,
+        query_embeddings=[list(vector) for vector in embed_queries(queries)],
+    )
+
+
+async def search_many(queries: list[str], n_results: int = 5, doc_type: str | None = None) -> list[list[dict]]:
+    """Run several vector searches with one embedding call and one Chroma query."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _SYNC_EXECUTOR, partial(_search_many, queries, n_results, doc_type)
+    )
 
-def _run_async(coro):
-    """Run an async coroutine from a sync context (LangChain tools are sync)."""
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        return asyncio.run(coro)
-    # If there's already a running loop (e.g. inside FastAPI), run in a new thread
-    import concurrent.futures
-    with concurrent.futures.ThreadPoolExecutor() as pool:
-        return pool.submit(asyncio.run, coro).result()
+
+def format_search_result(query: str, chunks: list[dict]) -> str:
+    """Render one query's chunks the way vector_search returns them."""
+    if not chunks:
+        return _dumps({"query": query, "chunks": [], "message": "No matching documents found."})
+    return _dumps({"query": query, "chunks": chunks})
 
 
 @tool
-def vector_search(query: str, n_results: int = 5, doc_type: str = None) -> str:
+async def vector_search(query: str, n_results: int = 5, doc_type: str = None) -> str:
     """Search financial documents using semantic similarity."""
-    settings = get_settings()
-    embedder = DocumentEmbedder(settings)
-    filters = {"doc_type": doc_type} if doc_type else None
-    results = embedder.search(query=query, n_results=n_results, filters=filters)
-    if not results:
-        return json.dumps({"query": query, "chunks": [], "message": "No matching documents found."})
-    return json.dumps({"query": query, "chunks": results}, indent=2, default=str)
+    chunks = (await search_many([query], n_results, doc_type))[0]
+    return format_search_result(query, chunks)
+
+
+@tool
+async def vector_search_many(queries: list[str], n_results: int = 5, doc_type: str = None) -> str:
+    """Search financial documents for several queries at once using semantic similarity."""
+    results = await search_many(queries, n_results, doc_type) if queries else []
+    return _dumps({
+        "results": [{"query": query, "chunks": chunks} for query, chunks in zip(queries, results)],
+    })
 
 
 @tool
-def sql_query(question: str) -> str:
+async def sql_query(question: str) -> str:
     """Query the financial metadata database using natural language. Converts question to SQL and executes."""
-    from langchain_anthropic import ChatAnthropic
-    settings = get_settings()
-    llm = ChatAnthropic(model=settings.default_llm, api_key=settings.anthropic_api_key, temperature=0)
+    llm = get_llm()
 
     sql_prompt = (
         "Convert this question to a PostgreSQL SELECT query. "
@@ -59,23 +134,53 @@ def sql_query(question: str) -> str:
         "IMPORTANT: Return ONLY the SQL query, nothing else. Only SELECT queries are allowed.\n\n"
         f"Question: {question}"
     )
-    response = llm.invoke([HumanMessage(content=sql_prompt)])
+    response = await llm.ainvoke([HumanMessage(content=sql_prompt)])
     sql = response.content.strip().strip('`').replace('sql\n', '')
 
     if not sql.upper().startswith('SELECT'):
-        return json.dumps({"error": "Only SELECT queries are allowed for safety."})
-
-    async def run_query():
-        async with async_session() as session:
-            result = await session.execute(text(sql))
-            rows = [dict(row._mapping) for row in result.fetchall()]
-            return rows
+        return _dumps({"error": "Only SELECT queries are allowed for safety."})
 
     try:
-        rows = _run_async(run_query())
-        return json.dumps({"question": question, "sql": sql, "rows": rows, "row_count": len(rows)}, indent=2, default=str)
+        async with async_session() as session:
+            rows = (await session.execute(text(sql))).mappings().all()
+        return _dumps({"question": question, "sql": sql, "rows": rows, "row_count": len(rows)})
     except Exception as e:
-        return json.dumps({"question": question, "sql": sql, "error": str(e)})
+        return _dumps({"question": question, "sql": sql, "error": str(e)})
+
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+@lru_cache(maxsize=256)
+def _parse_expression(expression: str) -> ast.expr:
+    """Parse an arithmetic expression once; repeated expressions reuse the tree."""
+    return ast.parse(expression, mode="eval").body
+
+
+def _evaluate(node: ast.expr, expression: str) -> Decimal:
+    """Evaluate a parsed arithmetic expression over Decimal operands.
+
+    Numeric literals are read from their source text so values such as
+    0.1 keep their exact decimal representation.
+    """
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return Decimal(expression[node.col_offset:node.end_col_offset])
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        return _BINARY_OPS[type(node.op)](
+            _evaluate(node.left, expression), _evaluate(node.right, expression)
+        )
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_evaluate(node.operand, expression))
+    raise ValueError(f"Unsupported expression element: {type(node).__name__}")
 
 
 @tool
@@ -87,49 +192,53 @@ def calculate(expression: str) -> str:
         allowed_chars = set("0123456789.+-*/() ")
         sanitized = expression.strip()
         if not all(ch in allowed_chars for ch in sanitized):
-            return json.dumps({"error": "Invalid characters in expression. Only numbers and +-*/() are allowed."})
+            return _dumps({"error": "Invalid characters in expression. Only numbers and +-*/() are allowed."})
 
-        result = Decimal(str(eval(sanitized)))  # noqa: S307
-        return json.dumps({
+        result = _evaluate(_parse_expression(sanitized), sanitized)
+        return _dumps({
             "expression": expression,
             "result": str(result),
             "formatted": f"INR {result:,.2f}",
         })
-    except (InvalidOperation, SyntaxError, ZeroDivisionError) as exc:
-        return json.dumps({"expression": expression, "error": str(exc)})
+    except (InvalidOperation, SyntaxError, ValueError, ZeroDivisionError) as exc:
+        return _dumps({"expression": expression, "error": str(exc)})
 
 
 @tool
-def compare_documents(doc_ids: list[str], comparison_type: str = "amount") -> str:
+async def compare_documents(doc_ids: list[str], comparison_type: str = "amount") -> str:
     """Cross-reference financial documents to find discrepancies."""
-    async def fetch_docs():
+    try:
         async with async_session() as session:
-            from sqlalchemy import select
             result = await session.execute(select(Document).where(Document.id.in_(doc_ids)))
-            return result.scalars().all()
-
-    try:
-        docs = _run_async(fetch_docs())
+            docs = result.scalars().all()
         if len(docs) < 2:
-            return json.dumps({"error": f"Need at least 2 documents, found {len(docs)}"})
+            return _dumps({"error": f"Need at least 2 documents, found {len(docs)}"})
 
         matches = []
         mismatches = []
-        for i, doc_a in enumerate(docs):
-            for doc_b in docs[i+1:]:
-                data_a = doc_a.extracted_data or {}
-                data_b = doc_b.extracted_data or {}
-                if comparison_type == "amount":
-                    total_a = data_a.get("total", 0)
-                    total_b = data_b.get("total", 0)
-                    if total_a == total_b:
-                        matches.append({"doc_a": doc_a.filename, "doc_b": doc_b.filename, "amount": total_a})
-                    else:
-                        mismatches.append({"doc_a": doc_a.filename, "doc_b": doc_b.filename, "amount_a": total_a, "amount_b": total_b, "difference": abs(total_a - total_b)})
-
-        return json.dumps({"doc_ids": doc_ids, "comparison_type": comparison_type, "matches": matches, "mismatches": mismatches, "summary": f"{len(matches)} matches, {len(mismatches)} mismatches"}, indent=2, default=str)
+        if comparison_type == "amount":
+            # Group by total once; equal totals match within a group, and every
+            # cross-group pair is a mismatch with one difference per group pair.
+            by_amount = defaultdict(list)
+            for doc in docs:
+                by_amount[(doc.extracted_data or {}).get("total", 0)].append(doc)
+            groups = list(by_amount.items())
+            for g, (amount_a, group_a) in enumerate(groups):
+                matches.extend(
+                    {"doc_a": doc_a.filename, "doc_b": doc_b.filename, "amount": amount_a}
+                    for doc_a, doc_b in combinations(group_a, 2)
+                )
+                for amount_b, group_b in groups[g + 1:]:
+                    difference = abs(amount_a - amount_b)
+                    mismatches.extend(
+                        {"doc_a": doc_a.filename, "doc_b": doc_b.filename, "amount_a": amount_a, "amount_b": amount_b, "difference": difference}
+                        for doc_a in group_a
+                        for doc_b in group_b
+                    )
+
+        return _dumps({"doc_ids": doc_ids, "comparison_type": comparison_type, "matches": matches, "mismatches": mismatches, "summary": f"{len(matches)} matches, {len(mismatches)} mismatches"})
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return _dumps({"error": str(e)})
 
 
 @tool
@@ -137,10 +246,10 @@ def generate_report(report_type: str, parameters: str = "") -> str:
     """Generate a structured financial report."""
     valid_types = {"gst_summary", "reconciliation", "discrepancy", "cashflow"}
     if report_type not in valid_types:
-        return json.dumps({"error": f"Unknown report type. Must be one of: {', '.join(sorted(valid_types))}"})
+        return _dumps({"error": f"Unknown report type. Must be one of: {', '.join(sorted(valid_types))}"})
 
-    generator = ReportGenerator()
-    params = json.loads(parameters) if parameters else {}
+    generator = _report_generator()
+    params = orjson.loads(parameters) if parameters else {}
 
     if report_type == "gst_summary":
         report_data = generator.generate_gst_summary(period=params.get("period", "Q4 2024"), data=params)
@@ -151,59 +260,55 @@ def generate_report(report_type: str, parameters: str = "") -> str:
     elif report_type == "cashflow":
         report_data = generator.generate_cashflow_analysis(period=params.get("period"), data=params)
 
-    return json.dumps({"report_type": report_type, "status": "generated", "data": report_data}, indent=2, default=str)
+    return _dumps({"report_type": report_type, "status": "generated", "data": report_data})
 
 
 @tool
 def export_data(data: str, format: str = "csv") -> str:
     """Export query results or reports to CSV or PDF format."""
     if format not in ("csv", "pdf"):
-        return json.dumps({"error": "Format must be 'csv' or 'pdf'"})
+        return _dumps({"error": "Format must be 'csv' or 'pdf'"})
 
-    generator = ReportGenerator()
+    generator = _report_generator()
     try:
-        report_data = json.loads(data)
-    except json.JSONDecodeError:
+        report_data = orjson.loads(data)
+    except orjson.JSONDecodeError:
         report_data = {"content": data}
 
     if format == "csv":
         csv_bytes = generator.export_to_csv(report_data)
-        return json.dumps({"format": "csv", "status": "exported", "size_bytes": len(csv_bytes), "message": "CSV export ready"})
+        return _dumps({"format": "csv", "status": "exported", "size_bytes": len(csv_bytes), "message": "CSV export ready"})
     else:
-        return json.dumps({"format": "pdf", "status": "exported", "message": "PDF export ready"})
+        return _dumps({"format": "pdf", "status": "exported", "message": "PDF export ready"})
 
 
 @tool
-def flag_discrepancy(description: str, severity: str = "medium", affected_docs: str = "") -> str:
+async def flag_discrepancy(description: str, severity: str = "medium", affected_docs: str = "") -> str:
     """Flag a financial discrepancy and save it to the database."""
     valid_severities = {"low", "medium", "high", "critical"}
     if severity not in valid_severities:
-        return json.dumps({"error": f"Severity must be one of: {', '.join(sorted(valid_severities))}"})
+        return _dumps({"error": f"Severity must be one of: {', '.join(sorted(valid_severities))}"})
 
     doc_list = [d.strip() for d in affected_docs.split(",") if d.strip()] if affected_docs else []
 
-    async def save_discrepancy():
-        async with async_session() as session:
-            record = DiscrepancyRecord(
-                id=uuid.uuid4(),
-                severity=severity,
-                affected_documents=doc_list,
-                description=description,
-                recommended_action=f"Review {severity}-severity discrepancy: {description}",
-            )
-            session.add(record)
-            await session.commit()
-            return str(record.id)
-
     try:
-        disc_id = _run_async(save_discrepancy())
-        return json.dumps({"discrepancy_id": disc_id, "severity": severity, "description": description, "affected_docs": doc_list, "status": "flagged"}, indent=2)
+        record = DiscrepancyRecord(
+            id=uuid.uuid4(),
+            severity=severity,
+            affected_documents=doc_list,
+            description=description,
+            recommended_action=f"Review {severity}-severity discrepancy: {description}",
+        )
+        await discrepancy_batcher.submit(record)
+        disc_id = str(record.id)
+        return _dumps({"discrepancy_id": disc_id, "severity": severity, "description": description, "affected_docs": doc_list, "status": "flagged"})
     except Exception as e:
-        return json.dumps({"error": str(e), "severity": severity, "description": description, "status": "flagged_locally"})
+        return _dumps({"error": str(e), "severity": severity, "description": description, "status": "flagged_locally"})
 
 
 ALL_TOOLS = [
     vector_search,
+    vector_search_many,
     sql_query,
     calculate,
     compare_documents,
@@ -211,3 +316,5 @@ ALL_TOOLS = [
     export_data,
     flag_discrepancy,
 ]
+
+TOOLS_BY_NAME = {t.name: t for t in ALL_TOOLS}
@@ -0,0 +1,66 @@
+"""Small in-process caches shared across the backend."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterator
+from typing import Any
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping with optional per-entry expiry.
+
+    Entries are stored as ``(expires_at, value)`` pairs against the monotonic
+    clock. The cache is not thread-safe and is meant to be used from the event
+    loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        """
+        Args:
+            maxsize: Maximum number of entries kept before evicting the oldest.
+            ttl: Default time-to-live in seconds, or None for no expiry.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store value under key, overriding the default TTL if ttl is given."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not), or default."""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def values(self) -> Iterator[Any]:
+        """Yield live values from oldest to newest, dropping expired entries."""
+        now = time.monotonic()
+        expired = [k for k, (exp, _) in self._data.items() if exp is not None and exp <= now]
+        for key in expired:
+            del self._data[key]
+        for _, value in self._data.values():
+            yield value
@@ -21,6 +21,11 @@ class Settings(BaseSettings):
     s3_access_key: str = "minioadmin"
     s3_secret_key: str = "minioadmin"
     s3_bucket: str = "finagent-documents"
+    # Endpoint browsers use for presigned uploads, if different from s3_endpoint
+    s3_public_endpoint: str = ""
+
+    # Job queue (arq). Empty runs document processing in-process instead.
+    redis_url: str = ""
 
     # LLM (Anthropic only)
     anthropic_api_key: str = ""
@@ -29,6 +34,7 @@ class Settings(BaseSettings):
     # Auth
     jwt_secret: str = "change-me-in-production"
     jwt_expiry_hours: int = 24
+    bcrypt_cost: int = 12
     resend_api_key: str = ""
     verification_url_base: str = "http://localhost:3000/verify"
     max_interactions: int = 50
@@ -4,7 +4,9 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.agent.batcher import discrepancy_batcher
 from backend.config import get_settings
+from backend.middleware.upload_limit import UploadSizeLimitMiddleware
 from backend.models.database import init_db
 from backend.routers import analytics, auth, chat, documents, reports
 
@@ -17,8 +19,16 @@ async def lifespan(app: FastAPI):
     logger.info("Starting FinAgent API...")
     await init_db()
     logger.info("Database initialized")
+    await auth.warm_bcrypt_pool()
+    try:
+        await documents.seed_sample_documents()
+        logger.info("Sample documents seeded")
+    except Exception as e:
+        logger.warning("Could not seed sample documents at startup: %s", e)
     yield
     logger.info("Shutting down FinAgent API...")
+    await discrepancy_batcher.close()
+    await documents.close_s3_clients()
 
 
 app = FastAPI(
@@ -28,6 +38,8 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Added first so CORS wraps it and its 413s still carry CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -1,38 +1,62 @@
+import time
 import uuid
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.cache import LRUCache
 from backend.config import get_settings
 from backend.models.database import User, get_db
 
 settings = get_settings()
 security = HTTPBearer()
 
+# Verified token -> user id, each entry expiring with its token
+_token_cache = LRUCache(maxsize=4096)
+
+
+def verify_token_cached(token: str) -> uuid.UUID:
+    """Verify a JWT and return its subject, memoized until the token expires.
+
+    Only tokens that verify are cached, so a rejected token is decoded (and
+    rejected) again on every use.
+
+    Raises:
+        JWTError: If the token is invalid, expired or has no UUID subject.
+    """
+    user_id = _token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
+    try:
+        user_id = uuid.UUID(payload.get("sub"))
+    except (TypeError, ValueError):
+        raise JWTError("Invalid token subject")
+
+    exp = payload.get("exp")
+    ttl = exp - time.time() if exp is not None else None
+    if ttl is None or ttl > 0:
+        _token_cache.set(token, user_id, ttl)
+    return user_id
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db),
 ) -> User:
-    token = credentials.credentials
     try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
-            )
+        user_id = verify_token_cached(credentials.credentials)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
         )
 
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
+    result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if user is None:
         raise HTTPException(
@@ -54,3 +78,24 @@ async def interaction_guard(user: User = Depends(get_current_user)) -> User:
 async def increment_interaction(user: User, db: AsyncSession) -> None:
     user.interaction_count += 1
     await db.commit()
+
+
+async def consume_interaction(user_id: uuid.UUID, db: AsyncSession) -> bool:
+    """Atomically count one interaction for a user still under their limit.
+
+    The check and increment are a single UPDATE, so concurrent messages from
+    the same user cannot both pass the limit.
+
+    Returns:
+        True if the interaction was counted, False if the user is at their
+        limit (or does not exist).
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, User.interaction_count < User.max_interactions)
+        .values(interaction_count=User.interaction_count + 1)
+        .returning(User.id)
+    )
+    consumed = result.first() is not None
+    await db.commit()
+    return consumed
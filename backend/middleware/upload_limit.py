@@ -0,0 +1,42 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.config import get_settings
+
+settings = get_settings()
+
+# Allowance for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """Reject oversized document uploads from their Content-Length header.
+
+    Route handlers only run after the multipart body has been parsed, so an
+    oversized upload would otherwise be received in full before being
+    refused. Requests without the header fall through to the handler's own
+    size check.
+    """
+
+    def __init__(self, app: ASGIApp, path_suffix: str = "/documents/upload"):
+        self.app = app
+        self.path_suffix = path_suffix
+        self.max_bytes = settings.max_file_size_mb * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"].endswith(self.path_suffix)
+        ):
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_bytes:
+                        response = JSONResponse(
+                            {"detail": f"File exceeds limit of {settings.max_file_size_mb}MB"},
+                            status_code=413,
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
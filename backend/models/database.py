@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Integer, JSON, DateTime, String, Text
+import orjson
+from sqlalchemy import Boolean, Index, Integer, JSON, DateTime, String, Text, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
@@ -9,7 +10,20 @@ from backend.config import get_settings
 
 settings = get_settings()
 
-engine = create_async_engine(settings.database_url, echo=settings.debug)
+
+def _json_serializer(obj) -> str:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# JSON columns (extracted_data, report data) are encoded/decoded with orjson
+engine = create_async_engine(
+    settings.database_url,
+    echo=settings.debug,
+    pool_size=20,
+    max_overflow=40,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -19,6 +33,15 @@ class Base(DeclarativeBase):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Partial: only pending verifications are indexed, NULLs stay out
+        Index(
+            "ix_users_verification_token",
+            "verification_token",
+            unique=True,
+            postgresql_where=text("verification_token IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
@@ -32,6 +55,7 @@ class User(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (Index("ix_documents_user_status", "user_id", "processing_status"),)
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     filename: Mapped[str] = mapped_column(String(255))
@@ -40,7 +64,8 @@ class Document(Base):
     upload_timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     user_id: Mapped[str] = mapped_column(String(255), default="default")
     processing_status: Mapped[str] = mapped_column(String(20), default="pending")  # pending/processing/completed/error
-    extracted_data: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # none_as_null: a Python None is stored as SQL NULL, not the JSON 'null'
+    extracted_data: Mapped[dict | None] = mapped_column(JSON(none_as_null=True), nullable=True)
     doc_type: Mapped[str | None] = mapped_column(String(50), nullable=True)  # invoice/bank_statement/gst_return
 
 
@@ -64,11 +89,36 @@ class Report(Base):
     data: Mapped[dict] = mapped_column(JSON)
     pdf_s3_key: Mapped[str | None] = mapped_column(String(512), nullable=True)
     status: Mapped[str] = mapped_column(String(20), default="generating")  # generating/completed/error
+    # sha256 of (report_type, parameters), for reusing identical completed reports
+    params_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+    __table_args__ = (Index("ix_reports_params_hash_status", "params_hash", "status"),)
 
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add later columns and indexes explicitly
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_verification_token "
+            "ON users (verification_token) WHERE verification_token IS NOT NULL"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_documents_user_status "
+            "ON documents (user_id, processing_status)"
+        ))
+        await conn.execute(text(
+            "ALTER TABLE reports ADD COLUMN IF NOT EXISTS params_hash VARCHAR(64)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_reports_params_hash_status "
+            "ON reports (params_hash, status)"
+        ))
+        # Uploads briefly stored extracted_data=None as JSON 'null'
+        await conn.execute(text(
+            "UPDATE documents SET extracted_data = NULL "
+            "WHERE extracted_data::text = 'null'"
+        ))
 
 
 async def get_db():
@@ -95,6 +95,17 @@ class DocumentResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class UploadInitRequest(BaseModel):
+    filename: str
+
+
+class UploadInitResponse(BaseModel):
+    document_id: uuid.UUID
+    s3_key: str
+    url: str
+    fields: dict
+
+
 class ChatMessage(BaseModel):
     role: str  # user / assistant
     content: str
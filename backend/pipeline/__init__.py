@@ -1,14 +1,23 @@
 """Document processing pipeline for FinAgent."""
 
-from backend.pipeline.chunker import Chunk, DocumentChunker
-from backend.pipeline.embedder import DocumentEmbedder
-from backend.pipeline.extractor import DocumentExtractor
-from backend.pipeline.structured import StructuredExtractor
-
-__all__ = [
-    "Chunk",
-    "DocumentChunker",
-    "DocumentEmbedder",
-    "DocumentExtractor",
-    "StructuredExtractor",
-]
+import importlib
+
+# Exports are imported on first access, so importing one submodule (e.g. the
+# extractor in a PDF worker process) doesn't load torch, chromadb and
+# langchain through the others.
+_EXPORTS = {
+    "Chunk": "backend.pipeline.chunker",
+    "DocumentChunker": "backend.pipeline.chunker",
+    "DocumentEmbedder": "backend.pipeline.embedder",
+    "DocumentExtractor": "backend.pipeline.extractor",
+    "StructuredExtractor": "backend.pipeline.structured",
+    "get_embedder": "backend.pipeline.embedder",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,59 @@
 """Semantic chunking for RAG over financial documents."""
 
+import bisect
 import logging
 import re
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+_AMOUNT_RE = re.compile(r"\d+[,.]?\d*\s*$", re.MULTILINE)
+_PAGE_RE = re.compile(r"---\s*Page\s+(\d+)\s*---")
+
+# How far _find_break_point looks back from the target position.
+_BREAK_WINDOW = 150
+
+# Zero-width lookaheads find every keyword occurrence, overlapping ones
+# included ("subtotal" also yields "total"), so the set of matches is exactly
+# the set of keywords present in the text. Matches keep the text's casing, so
+# they are lowercased before counting.
+_TAX_KEYWORDS_RE = re.compile(
+    r"(?=(grand total|net liability|subtotal|total|tax|gst))", re.IGNORECASE
+)
+_HEADER_KEYWORDS_RE = re.compile(
+    r"(?=(invoice|statement|return|date:|period:|gstin))", re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=4096)
+def _detect_chunk_type(text: str) -> str:
+    """Heuristic detection of chunk content type.
+
+    The result depends only on the text, so it is memoized across chunks and
+    documents; repeated boilerplate (headers, footers, disclaimers) is only
+    classified once.
+
+    Args:
+        text: The chunk text to classify.
+
+    Returns:
+        One of 'header', 'line_items', 'tax_summary', 'content'.
+    """
+    # Tax / summary indicators
+    if len({m.lower() for m in _TAX_KEYWORDS_RE.findall(text)}) >= 2:
+        return "tax_summary"
+
+    # Line-item / table indicators: multiple amounts on separate lines
+    if len(_AMOUNT_RE.findall(text)) >= 3:
+        return "line_items"
+
+    # Header indicators (beginning-of-document markers)
+    if len({m.lower() for m in _HEADER_KEYWORDS_RE.findall(text)}) >= 2:
+        return "header"
+
+    return "content"
+
 
 @dataclass
 class Chunk:
@@ -45,6 +93,8 @@ class DocumentChunker:
 
         # Build a page map: character offset -> page number
         page_map = self._build_page_map(text)
+        page_offsets = [offset for offset, _ in page_map]
+        page_numbers = [page for _, page in page_map]
 
         chunks: list[Chunk] = []
         start = 0
@@ -58,19 +108,8 @@ class DocumentChunker:
 
             chunk_text = text[start:end].strip()
             if chunk_text:
-                page_number = self._get_page_number(page_map, start)
-                chunk_type = self._detect_chunk_type(chunk_text)
-
-                metadata = {
-                    "document_id": document_id,
-                    "chunk_index": chunk_index,
-                    "chunk_type": chunk_type,
-                    "page_number": page_number,
-                }
-                if doc_type:
-                    metadata["doc_type"] = doc_type
-
-                chunks.append(Chunk(text=chunk_text, metadata=metadata))
+                page_number = self._get_page_number(page_offsets, page_numbers, start)
+                chunks.append(self._make_chunk(chunk_text, document_id, chunk_index, page_number, doc_type))
                 chunk_index += 1
 
             # Advance with overlap
@@ -85,33 +124,23 @@ class DocumentChunker:
         )
         return chunks
 
-    def _detect_chunk_type(self, text: str) -> str:
-        """Heuristic detection of chunk content type.
-
-        Args:
-            text: The chunk text to classify.
-
-        Returns:
-            One of 'header', 'line_items', 'tax_summary', 'content'.
-        """
-        lower = text.lower()
-
-        # Tax / summary indicators
-        tax_keywords = {"total", "subtotal", "tax", "gst", "net liability", "grand total"}
-        if sum(1 for kw in tax_keywords if kw in lower) >= 2:
-            return "tax_summary"
-
-        # Line-item / table indicators: multiple amounts on separate lines
-        amount_pattern = re.compile(r"\d+[,.]?\d*\s*$", re.MULTILINE)
-        if len(amount_pattern.findall(text)) >= 3:
-            return "line_items"
-
-        # Header indicators (beginning-of-document markers)
-        header_keywords = {"invoice", "statement", "return", "date:", "period:", "gstin"}
-        if sum(1 for kw in header_keywords if kw in lower) >= 2:
-            return "header"
-
-        return "content"
+    def _make_chunk(
+        self,
+        chunk_text: str,
+        document_id: str,
+        chunk_index: int,
+        page_number: int,
+        doc_type: str | None,
+    ) -> Chunk:
+        metadata = {
+            "document_id": document_id,
+            "chunk_index": chunk_index,
+            "chunk_type": _detect_chunk_type(chunk_text),
+            "page_number": page_number,
+        }
+        if doc_type:
+            metadata["doc_type"] = doc_type
+        return Chunk(text=chunk_text, metadata=metadata)
 
     def _find_break_point(self, text: str, target: int) -> int:
         """Find the best break point near the target position.
@@ -126,7 +155,7 @@ class DocumentChunker:
             The chosen break position.
         """
         # Search window: look back up to 150 chars from target
-        window_start = max(0, target - 150)
+        window_start = max(0, target - _BREAK_WINDOW)
         window = text[window_start:target]
 
         # Prefer paragraph break (double newline)
@@ -134,12 +163,11 @@ class DocumentChunker:
         if para_idx != -1:
             return window_start + para_idx + 2
 
-        # Sentence break (period/question/exclamation followed by space or newline)
-        sentence_match = None
-        for match in re.finditer(r"[.!?]\s", window):
-            sentence_match = match
-        if sentence_match is not None:
-            return window_start + sentence_match.end()
+        # Sentence break (period/question/exclamation followed by whitespace),
+        # scanning back from the target so the latest one wins
+        for i in range(len(window) - 2, -1, -1):
+            if window[i] in ".!?" and window[i + 1].isspace():
+                return window_start + i + 2
 
         # Word break (last space)
         space_idx = window.rfind(" ")
@@ -159,24 +187,22 @@ class DocumentChunker:
             Sorted list of (offset, page_number) tuples.
         """
         page_map: list[tuple[int, int]] = []
-        for match in re.finditer(r"---\s*Page\s+(\d+)\s*---", text):
+        for match in _PAGE_RE.finditer(text):
             page_map.append((match.start(), int(match.group(1))))
         return page_map
 
-    def _get_page_number(self, page_map: list[tuple[int, int]], offset: int) -> int:
+    def _get_page_number(
+        self, page_offsets: list[int], page_numbers: list[int], offset: int
+    ) -> int:
         """Determine the page number for a given character offset.
 
         Args:
-            page_map: Sorted list from _build_page_map.
+            page_offsets: Sorted marker offsets from _build_page_map.
+            page_numbers: Page numbers matching page_offsets.
             offset: Character offset in the document text.
 
         Returns:
-            Page number (1-based), defaults to 1 if no markers found.
+            Page number (1-based), defaults to 1 if no marker precedes offset.
         """
-        page = 1
-        for marker_offset, marker_page in page_map:
-            if marker_offset <= offset:
-                page = marker_page
-            else:
-                break
-        return page
+        idx = bisect.bisect_right(page_offsets, offset) - 1
+        return page_numbers[idx] if idx >= 0 else 1
@@ -1,18 +1,27 @@
 """Embedding generation and ChromaDB vector storage for financial documents.
 
-Uses ChromaDB's built-in SentenceTransformer embedding function (all-MiniLM-L6-v2)
-so no external API key is needed for embeddings. Embeddings are generated locally.
+Embeddings are generated locally with a SentenceTransformer (all-MiniLM-L6-v2),
+so no external API key is needed, and passed to ChromaDB precomputed.
 """
 
 import logging
+from functools import lru_cache
 
 import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+import torch
+from sentence_transformers import SentenceTransformer
 
+from backend.config import get_settings
 from backend.pipeline.chunker import Chunk
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 64
+# Chroma upsert throughput peaks around 100-250 records per call; larger
+# calls slow down and spike memory.
+UPSERT_BATCH_SIZE = 150
+
 
 class DocumentEmbedder:
     """Generates embeddings locally and stores/queries them in ChromaDB."""
@@ -22,21 +31,26 @@ class DocumentEmbedder:
             host=settings.chroma_host,
             port=settings.chroma_port,
         )
-        # Uses all-MiniLM-L6-v2 by default — runs locally, no API key needed
-        self.embedding_fn = SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
+        # Uses all-MiniLM-L6-v2 — runs locally, no API key needed. The model is
+        # loaded once per embedder and placed on the GPU when one is available.
+        self.model_name = EMBEDDING_MODEL
+        self.model = SentenceTransformer(
+            self.model_name,
+            device="cuda" if torch.cuda.is_available() else "cpu",
         )
+        # Every write and query passes embeddings explicitly, so the collection
+        # needs no embedding function of its own.
         self.collection = self.client.get_or_create_collection(
             name=settings.chroma_collection,
             metadata={"hnsw:space": "cosine"},
-            embedding_function=self.embedding_fn,
+            embedding_function=None,
         )
 
     def store_chunks(self, chunks: list[Chunk], document_id: str) -> None:
         """Embed chunks and store in ChromaDB with metadata.
 
-        ChromaDB auto-generates embeddings using the collection's embedding
-        function, so we only need to pass the raw text.
+        Chunks are embedded and upserted UPSERT_BATCH_SIZE at a time, with
+        the embeddings passed to ChromaDB precomputed.
         """
         if not chunks:
             logger.warning("No chunks to store for document %s", document_id)
@@ -52,20 +66,42 @@ class DocumentEmbedder:
             # ChromaDB requires metadata values to be str, int, float, or bool
             metadatas.append({k: v for k, v in meta.items() if v is not None})
 
-        self.collection.upsert(
-            ids=ids,
-            documents=texts,
-            metadatas=metadatas,
-        )
+        for start in range(0, len(texts), UPSERT_BATCH_SIZE):
+            end = start + UPSERT_BATCH_SIZE
+            self.collection.upsert(
+                ids=ids[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=self._embed_texts(texts[start:end]),
+            )
         logger.info(
             "Stored %d chunks for document %s in ChromaDB", len(chunks), document_id
         )
 
+    def _embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the local model, returning unit vectors in input order.
+
+        SentenceTransformer.encode sorts its input by length before batching
+        ("smart batching"), so each batch pads to about the same token count.
+        """
+        vectors = self.model.encode(
+            texts,
+            batch_size=EMBED_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return vectors.tolist()
+
+    def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Embed search queries in one call to the embedding model."""
+        return self._embed_texts(queries)
+
     def search(
         self,
         query: str,
         n_results: int = 5,
         filters: dict | None = None,
+        query_embedding: list[float] | None = None,
     ) -> list[dict]:
         """Semantic search over stored documents.
 
@@ -73,12 +109,40 @@ class DocumentEmbedder:
             query: Natural language search query.
             n_results: Maximum number of results to return.
             filters: Optional ChromaDB metadata filters (where clause).
+            query_embedding: Precomputed embedding of ``query``; embedded here
+                when omitted.
 
         Returns:
             List of dicts with keys: text, metadata, score.
         """
+        return self.search_many(
+            [query],
+            n_results=n_results,
+            filters=filters,
+            query_embeddings=[query_embedding] if query_embedding is not None else None,
+        )[0]
+
+    def search_many(
+        self,
+        queries: list[str],
+        n_results: int = 5,
+        filters: dict | None = None,
+        query_embeddings: list[list[float]] | None = None,
+    ) -> list[list[dict]]:
+        """Semantic search for several queries in a single ChromaDB request.
+
+        Args:
+            queries: Natural language search queries.
+            n_results: Maximum number of results to return per query.
+            filters: Optional ChromaDB metadata filters (where clause).
+            query_embeddings: Precomputed embeddings, one per query; embedded
+                here when omitted.
+
+        Returns:
+            One list of result dicts (text, metadata, score) per query.
+        """
         query_params: dict = {
-            "query_texts": [query],
+            "query_embeddings": query_embeddings or self.embed_queries(queries),
             "n_results": n_results,
         }
         if filters:
@@ -86,37 +150,46 @@ class DocumentEmbedder:
 
         results = self.collection.query(**query_params)
 
-        search_results: list[dict] = []
-        if results and results["documents"]:
-            documents = results["documents"][0]
-            metadatas = (
-                results["metadatas"][0]
-                if results["metadatas"]
-                else [{}] * len(documents)
-            )
-            distances = (
-                results["distances"][0]
-                if results["distances"]
-                else [0.0] * len(documents)
-            )
-
-            for doc, meta, dist in zip(documents, metadatas, distances):
-                search_results.append(
-                    {
-                        "text": doc,
-                        "metadata": meta,
-                        "score": round(1.0 - dist, 4),
-                    }
+        all_results: list[list[dict]] = []
+        for i, query in enumerate(queries):
+            search_results: list[dict] = []
+            if results and results["documents"]:
+                documents = results["documents"][i]
+                metadatas = (
+                    results["metadatas"][i]
+                    if results["metadatas"]
+                    else [{}] * len(documents)
+                )
+                distances = (
+                    results["distances"][i]
+                    if results["distances"]
+                    else [0.0] * len(documents)
                 )
 
-        logger.info(
-            "Search returned %d results for query: %.50s...",
-            len(search_results),
-            query,
-        )
-        return search_results
+                for doc, meta, dist in zip(documents, metadatas, distances):
+                    search_results.append(
+                        {
+                            "text": doc,
+                            "metadata": meta,
+                            "score": round(1.0 - dist, 4),
+                        }
+                    )
+
+            logger.info(
+                "Search returned %d results for query: %.50s...",
+                len(search_results),
+                query,
+            )
+            all_results.append(search_results)
+        return all_results
 
     def delete_document(self, document_id: str) -> None:
         """Remove all chunks for a document from ChromaDB."""
         self.collection.delete(where={"document_id": document_id})
         logger.info("Deleted all chunks for document %s from ChromaDB", document_id)
+
+
+@lru_cache(maxsize=1)
+def get_embedder() -> DocumentEmbedder:
+    """Process-wide embedder, so the Chroma client and embedding model load once."""
+    return DocumentEmbedder(get_settings())
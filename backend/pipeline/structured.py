@@ -1,10 +1,13 @@
 """LLM-powered structured data extraction from financial documents using Anthropic Claude."""
 
+import asyncio
+import hashlib
 import logging
 
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from backend.cache import LRUCache
 from backend.models.schemas import (
     BankStatementSchema,
     GSTReturnSchema,
@@ -15,6 +18,20 @@ logger = logging.getLogger(__name__)
 
 DOCUMENT_TYPES = {"invoice", "bank_statement", "gst_return"}
 
+# Upper bound on document text sent for extraction (~ Claude's context window)
+MAX_PROMPT_CHARS = 180_000
+
+SYSTEM_MSG = SystemMessage(content="Extract structured financial data accurately.")
+
+# Results keyed on (model, content hash), shared by all extractor instances so
+# retries and re-ingests of the same document skip the LLM.
+_classification_cache = LRUCache(maxsize=1024)
+_extraction_cache = LRUCache(maxsize=1024)
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
 CLASSIFICATION_PROMPT = """You are a financial document classifier. Analyze the following document text and classify it as one of these types:
 - invoice
 - bank_statement
@@ -83,10 +100,87 @@ class StructuredExtractor:
 
     def detect_document_type(self, text: str) -> str:
         """Use Claude to classify document as invoice, bank_statement, or gst_return."""
-        prompt = CLASSIFICATION_PROMPT.format(text=text[:3000])
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        doc_type = response.content.strip().lower()
+        key = self._classification_key(text)
+        doc_type = _classification_cache.get(key)
+        if doc_type is None:
+            response = self.llm.invoke(self._classification_messages(text))
+            doc_type = self._parse_document_type(response.content)
+            _classification_cache.set(key, doc_type)
+        return doc_type
 
+    def extract(self, text: str, doc_type: str) -> dict:
+        """Extract structured data based on document type using Claude's structured output."""
+        schema, messages = self._extraction_request(text, doc_type)
+        key = self._extraction_key(text, doc_type)
+        data = _extraction_cache.get(key)
+        if data is None:
+            data = self.llm.with_structured_output(schema).invoke(messages).model_dump()
+            _extraction_cache.set(key, data)
+            logger.info("Extracted structured %s data", doc_type)
+        return data
+
+    async def adetect_document_type(self, text: str) -> str:
+        """Async variant of detect_document_type."""
+        key = self._classification_key(text)
+        doc_type = _classification_cache.get(key)
+        if doc_type is None:
+            response = await self.llm.ainvoke(self._classification_messages(text))
+            doc_type = self._parse_document_type(response.content)
+            _classification_cache.set(key, doc_type)
+        return doc_type
+
+    async def aextract(self, text: str, doc_type: str) -> dict:
+        """Async variant of extract."""
+        schema, messages = self._extraction_request(text, doc_type)
+        key = self._extraction_key(text, doc_type)
+        data = _extraction_cache.get(key)
+        if data is None:
+            result = await self.llm.with_structured_output(schema).ainvoke(messages)
+            data = result.model_dump()
+            _extraction_cache.set(key, data)
+            logger.info("Extracted structured %s data", doc_type)
+        return data
+
+    async def classify_and_extract(self, text: str) -> tuple[str, dict]:
+        """Classify a document and extract its structured data.
+
+        Invoice extraction is started speculatively alongside classification,
+        since invoices are the most common upload; when the document is an
+        invoice this saves a full LLM round trip. Otherwise the speculative
+        result is discarded and the matching extraction runs afterwards.
+
+        Returns:
+            Tuple of (doc_type, extracted_data).
+        """
+        doc_type = _classification_cache.get(self._classification_key(text))
+        if doc_type is not None:
+            return doc_type, await self.aextract(text, doc_type)
+
+        doc_type, invoice_data = await asyncio.gather(
+            self.adetect_document_type(text),
+            self.aextract(text, "invoice"),
+            return_exceptions=True,
+        )
+        if isinstance(doc_type, BaseException):
+            raise doc_type
+        if doc_type == "invoice":
+            if isinstance(invoice_data, BaseException):
+                raise invoice_data
+            return doc_type, invoice_data
+        return doc_type, await self.aextract(text, doc_type)
+
+    def _classification_key(self, text: str) -> tuple[str, str]:
+        # Classification only sees the first 3000 characters
+        return self.llm.model, _content_hash(text[:3000])
+
+    def _extraction_key(self, text: str, doc_type: str) -> tuple[str, str, str]:
+        return self.llm.model, doc_type, _content_hash(text[:MAX_PROMPT_CHARS])
+
+    def _classification_messages(self, text: str) -> list[HumanMessage]:
+        return [HumanMessage(content=CLASSIFICATION_PROMPT.format(text=text[:3000]))]
+
+    def _parse_document_type(self, content: str) -> str:
+        doc_type = content.strip().lower()
         if doc_type not in DOCUMENT_TYPES:
             logger.warning(
                 "LLM returned unknown document type '%s', defaulting to 'invoice'",
@@ -97,22 +191,12 @@ class StructuredExtractor:
         logger.info("Detected document type: %s", doc_type)
         return doc_type
 
-    def extract(self, text: str, doc_type: str) -> dict:
-        """Extract structured data based on document type using Claude's structured output."""
+    def _extraction_request(self, text: str, doc_type: str) -> tuple[type, list]:
         if doc_type not in SCHEMA_MAP:
             raise ValueError(
                 f"Unknown document type: {doc_type}. "
                 f"Must be one of: {', '.join(sorted(SCHEMA_MAP))}"
             )
 
-        schema = SCHEMA_MAP[doc_type]
-        prompt = EXTRACTION_PROMPTS[doc_type].format(text=text)
-
-        structured_llm = self.llm.with_structured_output(schema)
-        result = structured_llm.invoke([
-            SystemMessage(content="Extract structured financial data accurately."),
-            HumanMessage(content=prompt),
-        ])
-
-        logger.info("Extracted structured %s data", doc_type)
-        return result.model_dump()
+        prompt = EXTRACTION_PROMPTS[doc_type].format(text=text[:MAX_PROMPT_CHARS])
+        return SCHEMA_MAP[doc_type], [SYSTEM_MSG, HumanMessage(content=prompt)]
@@ -1,11 +1,28 @@
+import asyncio
 import csv
 import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 from jinja2 import Environment, FileSystemLoader
 
 
+@lru_cache(maxsize=1)
+def _font_config():
+    """WeasyPrint font configuration shared by every PDF render.
+
+    Building it loads the system fonts through fontconfig, which is the bulk
+    of the fixed cost of a small report.
+    """
+    from weasyprint.text.fonts import FontConfiguration
+
+    return FontConfiguration()
+
+
 class ReportGenerator:
     """Generates structured financial reports in multiple formats."""
 
@@ -101,22 +118,68 @@ class ReportGenerator:
 
         template = self.jinja_env.get_template(f"{template_name}.html")
         html = template.render(**report_data)
-        return weasyprint.HTML(string=html).write_pdf()
+        return weasyprint.HTML(string=html).write_pdf(font_config=_font_config())
 
     def export_to_csv(self, report_data: dict) -> bytes:
         """Export report data to CSV. Uses the 'items' key from report data
         as the rows, or flattens top-level keys if no items exist."""
-        output = io.StringIO()
+        return b"".join(self.iter_csv(report_data))
+
+    def iter_csv(self, report_data: dict, batch_size: int = 500):
+        """Yield the CSV export of report data as encoded chunks of up to
+        ``batch_size`` rows, for streaming responses."""
+        buffer = io.BytesIO()
+        output = io.TextIOWrapper(buffer, encoding="utf-8", newline="", write_through=True)
+        writer = csv.writer(output)
         items = report_data.get("items", [])
 
         if items:
-            writer = csv.DictWriter(output, fieldnames=items[0].keys())
-            writer.writeheader()
-            writer.writerows(items)
+            fields = list(items[0])
+            writer.writerow(fields)
+            rows = ([row.get(f, "") for f in fields] for row in items)
         else:
-            writer = csv.writer(output)
-            for key, value in report_data.items():
-                if not isinstance(value, (list, dict)):
-                    writer.writerow([key, value])
+            rows = (
+                [key, value]
+                for key, value in report_data.items()
+                if not isinstance(value, (list, dict))
+            )
+
+        for i, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if i % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        output.detach()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+@lru_cache(maxsize=1)
+def _render_pool() -> ProcessPoolExecutor:
+    """Process pool for PDF rendering, started on first use and kept.
+
+    WeasyPrint layout is mostly pure Python, so rendering in processes keeps
+    it off the event loop without contending for the server's GIL. Uses
+    spawn so workers never inherit the server's threads or event loop.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+@lru_cache(maxsize=1)
+def _worker_generator() -> ReportGenerator:
+    return ReportGenerator()
+
+
+def _render_pdf(report_data: dict, template_name: str) -> bytes:
+    return _worker_generator().render_to_pdf(report_data, template_name)
+
 
-        return output.getvalue().encode("utf-8")
+async def render_to_pdf_async(report_data: dict, template_name: str) -> bytes:
+    """Render a report PDF in the render process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_render_pool(), _render_pdf, report_data, template_name)
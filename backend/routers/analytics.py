@@ -1,7 +1,7 @@
 import logging
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import func, select
+from sqlalchemy import Float, cast, func, literal_column, select, true
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.middleware.auth import get_current_user
@@ -17,50 +17,70 @@ async def get_analytics_summary(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    # Count documents
-    doc_count = (await db.execute(select(func.count(Document.id)))).scalar() or 0
+    # Count documents, discrepancies and reports in one round-trip
+    counts = (
+        await db.execute(
+            select(
+                select(func.count(Document.id)).scalar_subquery(),
+                select(func.count(DiscrepancyRecord.id)).scalar_subquery(),
+                select(func.count(Report.id)).scalar_subquery(),
+            )
+        )
+    ).one()
+    doc_count, disc_count, report_count = (count or 0 for count in counts)
 
-    # Count discrepancies
-    disc_count = (await db.execute(select(func.count(DiscrepancyRecord.id)))).scalar() or 0
+    # Total invoice amount, summed in Postgres
+    total_amount = (
+        await db.execute(
+            select(func.sum(Document.extracted_data["total"].as_float())).where(
+                Document.doc_type == "invoice", Document.extracted_data.isnot(None)
+            )
+        )
+    ).scalar() or 0
 
-    # Count reports
-    report_count = (await db.execute(select(func.count(Report.id)))).scalar() or 0
-
-    # Calculate total invoice amount from extracted_data
-    docs_result = await db.execute(
-        select(Document).where(Document.doc_type == "invoice", Document.extracted_data.isnot(None))
+    # Monthly expenses: bank statement debits summed per YYYY-MM in Postgres.
+    # Groups are referenced by label, since the bound JSON keys would make
+    # repeated expressions differ.
+    entry = (
+        func.json_array_elements(Document.extracted_data["entries"])
+        .table_valued("value")
+        .lateral("entry")
     )
-    invoices = docs_result.scalars().all()
-    total_amount = sum(
-        (doc.extracted_data or {}).get("total", 0) for doc in invoices
+    debit = cast(entry.c.value.op("->>")("debit"), Float)
+    month = func.substr(func.coalesce(entry.c.value.op("->>")("date"), ""), 1, 7)
+    monthly_result = await db.execute(
+        select(month.label("month"), func.sum(debit).label("amount"))
+        .select_from(Document)
+        .join(entry, true())
+        .where(
+            Document.doc_type == "bank_statement",
+            Document.extracted_data.isnot(None),
+            debit != 0,
+        )
+        .group_by(literal_column("month"))
+        .order_by(literal_column("month"))
     )
+    monthly_expenses = [
+        {"month": row.month, "amount": row.amount} for row in monthly_result
+    ]
 
-    # Build monthly expenses from bank statement entries
-    monthly_expenses = []
-    bank_docs = await db.execute(
-        select(Document).where(Document.doc_type == "bank_statement", Document.extracted_data.isnot(None))
+    # Vendor distribution: invoice totals and counts per vendor
+    vendor = func.coalesce(Document.extracted_data["vendor_name"].as_string(), "Unknown")
+    amount = func.coalesce(Document.extracted_data["total"].as_float(), 0)
+    vendor_result = await db.execute(
+        select(
+            vendor.label("vendor"),
+            func.sum(amount).label("amount"),
+            func.count().label("count"),
+        )
+        .where(Document.doc_type == "invoice", Document.extracted_data.isnot(None))
+        .group_by(literal_column("vendor"))
+        .order_by(literal_column("vendor"))
     )
-    for doc in bank_docs.scalars().all():
-        entries = (doc.extracted_data or {}).get("entries", [])
-        month_totals = {}
-        for entry in entries:
-            if entry.get("debit"):
-                month = entry.get("date", "")[:7]  # YYYY-MM
-                month_totals[month] = month_totals.get(month, 0) + entry["debit"]
-        for month, amount in sorted(month_totals.items()):
-            monthly_expenses.append({"month": month, "amount": amount})
-
-    # Build vendor distribution from invoices
-    vendor_dist = {}
-    for doc in invoices:
-        data = doc.extracted_data or {}
-        vendor = data.get("vendor_name", "Unknown")
-        amount = data.get("total", 0)
-        if vendor in vendor_dist:
-            vendor_dist[vendor]["amount"] += amount
-            vendor_dist[vendor]["count"] += 1
-        else:
-            vendor_dist[vendor] = {"vendor": vendor, "amount": amount, "count": 1}
+    vendor_distribution = [
+        {"vendor": row.vendor, "amount": row.amount, "count": row.count}
+        for row in vendor_result
+    ]
 
     return AnalyticsSummary(
         total_documents=doc_count,
@@ -68,5 +88,5 @@ async def get_analytics_summary(
         discrepancies_found=disc_count,
         reports_generated=report_count,
         monthly_expenses=monthly_expenses,
-        vendor_distribution=list(vendor_dist.values()),
+        vendor_distribution=vendor_distribution,
     )
@@ -1,5 +1,9 @@
+import asyncio
 import logging
+import os
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
@@ -23,9 +27,17 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# bcrypt releases the GIL, so hashing on these threads keeps the event loop
+# free and lets concurrent logins use every core.
+_BCRYPT_WORKERS = os.cpu_count() or 1
+_BCRYPT_POOL = ThreadPoolExecutor(
+    max_workers=_BCRYPT_WORKERS, thread_name_prefix="bcrypt"
+)
+
+
 def hash_password(password: str) -> str:
     pw = password.encode("utf-8")[:72]
-    return bcrypt.hashpw(pw, bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(pw, bcrypt.gensalt(rounds=settings.bcrypt_cost)).decode("utf-8")
 
 
 def verify_password(password: str, hashed: str) -> bool:
@@ -33,6 +45,30 @@ def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(pw, hashed.encode("utf-8"))
 
 
+async def warm_bcrypt_pool() -> None:
+    """Start every bcrypt worker thread so a burst of logins doesn't pay for thread startup.
+
+    Each task blocks on a shared barrier, which forces the executor to spawn
+    a new thread per task rather than reusing an idle one.
+    """
+    loop = asyncio.get_running_loop()
+    barrier = threading.Barrier(_BCRYPT_WORKERS)
+    await asyncio.gather(*(
+        loop.run_in_executor(_BCRYPT_POOL, barrier.wait)
+        for _ in range(_BCRYPT_WORKERS)
+    ))
+
+
+async def ahash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_BCRYPT_POOL, hash_password, password)
+
+
+async def averify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_BCRYPT_POOL, verify_password, password, hashed)
+
+
 def create_access_token(user_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(hours=settings.jwt_expiry_hours)
     payload = {"sub": user_id, "exp": expire}
@@ -74,7 +110,7 @@ async def signup(request: SignupRequest, db: AsyncSession = Depends(get_db)):
 
     user = User(
         email=request.email,
-        password_hash=hash_password(request.password),
+        password_hash=await ahash_password(request.password),
         is_verified=False,
         verification_token=verification_token,
         interaction_count=0,
@@ -93,10 +129,15 @@ async def signup(request: SignupRequest, db: AsyncSession = Depends(get_db)):
 
 @router.post("/login", response_model=AuthResponse)
 async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).where(User.email == request.email))
-    user = result.scalar_one_or_none()
+    # Only the columns login needs, not a full User
+    result = await db.execute(
+        select(User.id, User.email, User.password_hash, User.is_verified).where(
+            User.email == request.email
+        )
+    )
+    user = result.first()
 
-    if not user or not verify_password(request.password, user.password_hash):
+    if not user or not await averify_password(request.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
@@ -119,7 +160,7 @@ async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
     )
     user = result.scalar_one_or_none()
 
-    if not user:
+    if not user or not secrets.compare_digest(user.verification_token, token):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired verification token",
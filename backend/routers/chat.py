@@ -1,23 +1,56 @@
-import json
+import asyncio
+import time
 import uuid
 import logging
-from datetime import datetime, timezone
+from collections.abc import AsyncIterator
 
+import orjson
 from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect
-from jose import JWTError, jwt as jose_jwt
-from langchain_core.messages import HumanMessage
+from fastapi.responses import StreamingResponse
+from jose import JWTError
+from langchain_core.messages import AIMessageChunk, HumanMessage
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.agent.graph import create_agent_graph
-from backend.config import get_settings
-from backend.middleware.auth import get_current_user, interaction_guard, increment_interaction
+from backend.agent import compiled_agent
+from backend.middleware.auth import (
+    consume_interaction,
+    get_current_user,
+    increment_interaction,
+    interaction_guard,
+    verify_token_cached,
+)
 from backend.models.database import User, get_db, async_session
 from backend.models.schemas import ChatMessage, ChatRequest, ChatResponse
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 logger = logging.getLogger(__name__)
-settings = get_settings()
+
+EMPTY_MESSAGE_REPLY = "Please enter a question."
+
+# Websocket frames buffered while an earlier message is being answered
+WS_QUEUE_SIZE = 4
+
+# Fixed part of the agent's starting state. Copies share the empty lists,
+# which is safe because nodes and reducers return new lists instead of
+# mutating state in place.
+_INITIAL_STATE_TEMPLATE = {
+    "classification": None,
+    "plan_steps": [],
+    "plan_levels": [],
+    "current_level": 0,
+    "tool_results": [],
+    "final_answer": None,
+    "citations": [],
+    "thinking_steps": [],
+}
+
+
+def _initial_state(query: str) -> dict:
+    state = _INITIAL_STATE_TEMPLATE.copy()
+    state["messages"] = [HumanMessage(content=query)]
+    state["query"] = query
+    return state
 
 
 @router.post("/", response_model=ChatResponse)
@@ -26,23 +59,17 @@ async def chat(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(interaction_guard),
 ):
-    await increment_interaction(current_user, db)
     conversation_id = request.conversation_id or str(uuid.uuid4())
+    if not request.message.strip():
+        return ChatResponse(
+            message=ChatMessage(role="assistant", content=EMPTY_MESSAGE_REPLY),
+            conversation_id=conversation_id,
+        )
+
+    await increment_interaction(current_user, db)
 
     try:
-        graph = create_agent_graph()
-        initial_state = {
-            "messages": [HumanMessage(content=request.message)],
-            "query": request.message,
-            "classification": None,
-            "plan_steps": [],
-            "current_step": 0,
-            "tool_results": [],
-            "final_answer": None,
-            "citations": [],
-            "thinking_steps": [],
-        }
-        result = graph.invoke(initial_state)
+        result = await compiled_agent.ainvoke(_initial_state(request.message))
 
         response_message = ChatMessage(
             role="assistant",
@@ -60,16 +87,154 @@ async def chat(
     return ChatResponse(message=response_message, conversation_id=conversation_id)
 
 
+def _agent_message(content: str, citations: list | None = None) -> dict:
+    return {
+        "type": "message",
+        "message": {
+            "id": uuid.uuid4().hex,
+            "role": "agent",
+            "content": content,
+            "citations": citations or [],
+            "timestamp_ms": time.time_ns() // 1_000_000,
+        },
+    }
+
+
+def _encode_frame(frame: dict) -> str:
+    """Serialize a frame to JSON text."""
+    return orjson.dumps(frame, default=str).decode()
+
+
+async def stream_agent(query: str) -> AsyncIterator[dict]:
+    """Run the agent on query, yielding frames as they become available.
+
+    Yields one "thinking_batch" frame per graph update carrying its thinking
+    steps, and a "stream" frame for each token of the synthesized answer,
+    closed by a done frame carrying the citations. When nothing was streamed
+    (a cached answer) a single "message" frame carries the answer instead.
+    """
+    message_id = uuid.uuid4().hex
+    streamed = False
+    final_answer = None
+    citations = []
+
+    async for mode, event in compiled_agent.astream(_initial_state(query), stream_mode=["updates", "messages"]):
+        if mode == "messages":
+            token, metadata = event
+            # Only generated tokens; whole messages (cache hits, node outputs)
+            # arrive in the final answer instead
+            if (
+                isinstance(token, AIMessageChunk)
+                and metadata.get("langgraph_node") == "synthesize"
+                and isinstance(token.content, str)
+                and token.content
+            ):
+                streamed = True
+                yield {"type": "stream", "message_id": message_id, "content": token.content, "done": False}
+            continue
+
+        steps = [
+            {
+                "type": "thinking",
+                "content": step.get("description", "Processing..."),
+                "tool": step.get("step", node_name),
+            }
+            for node_name, node_output in event.items()
+            for step in node_output.get("thinking_steps", [])
+        ]
+        if steps:
+            yield {"type": "thinking_batch", "steps": steps}
+
+        for node_output in event.values():
+            if node_output.get("final_answer"):
+                final_answer = node_output["final_answer"]
+            if "citations" in node_output:
+                citations = node_output["citations"]
+
+    if streamed:
+        yield {
+            "type": "stream",
+            "message_id": message_id,
+            "content": "",
+            "done": True,
+            "citations": citations,
+        }
+    else:
+        yield _agent_message(final_answer or "I could not generate a response.", citations)
+
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(interaction_guard),
+):
+    """Server-sent events variant of POST /chat; each event carries one WebSocket-style frame."""
+    is_empty = not request.message.strip()
+    if not is_empty:
+        await increment_interaction(current_user, db)
+
+    async def events() -> AsyncIterator[str]:
+        if is_empty:
+            yield f"data: {_encode_frame(_agent_message(EMPTY_MESSAGE_REPLY))}\n\n"
+            return
+        try:
+            async for frame in stream_agent(request.message):
+                yield f"data: {_encode_frame(frame)}\n\n"
+        except Exception as e:
+            logger.error("Agent stream error: %s", e)
+            yield f"data: {_encode_frame(_agent_message(f'Error: {str(e)}'))}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 async def authenticate_websocket(token: str) -> uuid.UUID | None:
     """Validate JWT from WebSocket query param and return user ID."""
     try:
-        payload = jose_jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if user_id:
-            return uuid.UUID(user_id)
-    except (JWTError, ValueError):
-        pass
-    return None
+        return verify_token_cached(token)
+    except JWTError:
+        return None
+
+
+async def _handle_ws_message(websocket: WebSocket, user_id: uuid.UUID, data: str) -> None:
+    """Check the interaction limit for one websocket message and stream the agent's answer."""
+    message = orjson.loads(data)
+    user_msg = message.get("content", "") or message.get("message", "")
+    is_retry = message.get("retry", False)
+
+    # Nothing to answer; don't touch the DB or spend an interaction
+    if not user_msg.strip():
+        await websocket.send_text(_encode_frame(_agent_message(EMPTY_MESSAGE_REPLY)))
+        return
+
+    # Check interaction limit and increment (skip increment on retry)
+    async with async_session() as db:
+        if is_retry:
+            row = (await db.execute(
+                select(User.interaction_count, User.max_interactions).where(User.id == user_id)
+            )).first()
+            allowed = row is not None and row.interaction_count < row.max_interactions
+        else:
+            allowed = await consume_interaction(user_id, db)
+        if not allowed:
+            max_interactions = await db.scalar(
+                select(User.max_interactions).where(User.id == user_id)
+            )
+            await websocket.send_text(_encode_frame(_agent_message(
+                f"You have used all {max_interactions or 50} interactions. No more requests allowed."
+            )))
+            return
+
+    try:
+        async for frame in stream_agent(user_msg):
+            await websocket.send_text(_encode_frame(frame))
+    except Exception as e:
+        logger.error("Agent WebSocket error: %s", e)
+        await websocket.send_text(_encode_frame(_agent_message(f"Error: {str(e)}")))
 
 
 @router.websocket("/ws")
@@ -84,91 +249,35 @@ async def chat_websocket(websocket: WebSocket, token: str = Query(default="")):
         return
 
     await websocket.accept()
-    try:
-        while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            user_msg = message.get("content", "") or message.get("message", "")
-            is_retry = message.get("retry", False)
-
-            # Check interaction limit and increment (skip increment on retry)
-            async with async_session() as db:
-                result = await db.execute(select(User).where(User.id == user_id))
-                user = result.scalar_one_or_none()
-                if not user or user.interaction_count >= user.max_interactions:
-                    await websocket.send_json({
-                        "type": "message",
-                        "message": {
-                            "id": str(uuid.uuid4()),
-                            "role": "agent",
-                            "content": f"You have used all {user.max_interactions if user else 50} interactions. No more requests allowed.",
-                            "citations": [],
-                            "timestamp": datetime.now(timezone.utc).isoformat(),
-                        },
-                    })
-                    continue
-                if not is_retry:
-                    user.interaction_count += 1
-                    await db.commit()
 
-            try:
-                graph = create_agent_graph()
-                initial_state = {
-                    "messages": [HumanMessage(content=user_msg)],
-                    "query": user_msg,
-                    "classification": None,
-                    "plan_steps": [],
-                    "current_step": 0,
-                    "tool_results": [],
-                    "final_answer": None,
-                    "citations": [],
-                    "thinking_steps": [],
-                }
-
-                # Stream thinking steps and capture final result
-                final_answer = None
-                citations = []
-
-                async for event in graph.astream(initial_state):
-                    for node_name, node_output in event.items():
-                        steps = node_output.get("thinking_steps", [])
-                        for step in steps:
-                            await websocket.send_json({
-                                "type": "thinking",
-                                "content": step.get("description", "Processing..."),
-                                "tool": step.get("step", node_name),
-                            })
-                        if node_output.get("final_answer"):
-                            final_answer = node_output["final_answer"]
-                        if "citations" in node_output:
-                            citations = node_output["citations"]
-
-                if not final_answer:
-                    final_answer = "I could not generate a response."
-
-                await websocket.send_json({
-                    "type": "message",
-                    "message": {
-                        "id": str(uuid.uuid4()),
-                        "role": "agent",
-                        "content": final_answer,
-                        "citations": citations,
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                    },
-                })
+    # Frames are read as they arrive and handled in order by a worker task,
+    # so the socket keeps draining while an answer streams. The bounded
+    # queue stops reading when the client gets too far ahead.
+    queue: asyncio.Queue[str] = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
 
+    async def work() -> None:
+        # A failed message must not end the worker: the receiver would then
+        # fill the queue and block on put() with the socket left hanging.
+        while True:
+            data = await queue.get()
+            try:
+                await _handle_ws_message(websocket, user_id, data)
             except Exception as e:
-                logger.error("Agent WebSocket error: %s", e)
-                await websocket.send_json({
-                    "type": "message",
-                    "message": {
-                        "id": str(uuid.uuid4()),
-                        "role": "agent",
-                        "content": f"Error: {str(e)}",
-                        "citations": [],
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                    },
-                })
+                logger.error("WebSocket message handling failed: %s", e)
+                try:
+                    await websocket.send_text(
+                        _encode_frame(_agent_message("Error: could not process your message."))
+                    )
+                except Exception:
+                    # The socket is gone; the receiver sees the disconnect
+                    pass
 
+    worker = asyncio.create_task(work())
+    try:
+        while True:
+            await queue.put(await websocket.receive_text())
     except WebSocketDisconnect:
         logger.info("WebSocket client disconnected")
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
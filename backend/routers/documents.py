@@ -1,23 +1,28 @@
+import asyncio
+import os
 import uuid
 import tempfile
 import logging
-from datetime import datetime
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
-import boto3
+import aioboto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config as BotoConfig
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, status
-from sqlalchemy import select
+from sqlalchemy import delete, lambda_stmt, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.config import get_settings
 from backend.middleware.auth import get_current_user, interaction_guard, increment_interaction
 from backend.models.database import Document, User, get_db, async_session
-from backend.models.schemas import DocumentResponse
+from backend.models.schemas import DocumentResponse, UploadInitRequest, UploadInitResponse
 from backend.pipeline.extractor import DocumentExtractor
 from backend.pipeline.structured import StructuredExtractor
 from backend.pipeline.chunker import DocumentChunker
-from backend.pipeline.embedder import DocumentEmbedder
+from backend.pipeline.embedder import get_embedder
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 settings = get_settings()
@@ -31,6 +36,23 @@ SAMPLE_FILENAMES = [
     "gst_return_Q4_2024.csv",
 ]
 
+# Files over 8 MB go up as multipart in 16 MB parts, up to 10 at a time;
+# smaller ones (samples, typical invoices) stay a single PUT.
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=10,
+    # Each part is assembled from the spooled file in 1 MB reads (16 per
+    # part) rather than the default 256 KB ones
+    io_chunksize=1024 * 1024,
+)
+
+PRESIGNED_UPLOAD_EXPIRY_SECONDS = 300
+# Initiated uploads not completed within this long are treated as abandoned:
+# hidden from the document list and deleted on the user's next initiation.
+# Well past the presign expiry, so slow uploads still get to complete.
+STALE_UPLOAD_AFTER = timedelta(hours=1)
+
 # Resolve sample data directory (works both locally and in Docker)
 _SAMPLE_DATA_DIR = Path(__file__).resolve().parent.parent / "sample_data"
 if not _SAMPLE_DATA_DIR.exists():
@@ -38,59 +60,181 @@ if not _SAMPLE_DATA_DIR.exists():
     _SAMPLE_DATA_DIR = Path(__file__).resolve().parent.parent.parent / "sample-documents"
 
 
-def get_s3_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=settings.s3_endpoint,
-        aws_access_key_id=settings.s3_access_key,
-        aws_secret_access_key=settings.s3_secret_key,
-        config=BotoConfig(signature_version="s3v4"),
-        region_name="us-east-1",
-    )
+_s3_session = aioboto3.Session()
+
+
+_s3_clients: dict[str, object] = {}
+_s3_clients_stack = AsyncExitStack()
+_s3_clients_lock = asyncio.Lock()
+
+# Enough pooled connections for concurrent multipart parts across uploads
+S3_CLIENT_CONFIG = BotoConfig(
+    signature_version="s3v4",
+    max_pool_connections=50,
+    retries={"mode": "standard", "max_attempts": 5},
+    tcp_keepalive=True,
+)
+
+
+async def get_s3_client(endpoint_url: str | None = None):
+    """Return the shared async S3 client for an endpoint, opening it on first use.
+
+    Clients stay open for the life of the process, so credentials, endpoint
+    resolution and keep-alive connections are reused across requests.
+    """
+    endpoint_url = endpoint_url or settings.s3_endpoint
+    client = _s3_clients.get(endpoint_url)
+    if client is None:
+        async with _s3_clients_lock:
+            client = _s3_clients.get(endpoint_url)
+            if client is None:
+                client = await _s3_clients_stack.enter_async_context(
+                    _s3_session.client(
+                        "s3",
+                        endpoint_url=endpoint_url,
+                        aws_access_key_id=settings.s3_access_key,
+                        aws_secret_access_key=settings.s3_secret_key,
+                        config=S3_CLIENT_CONFIG,
+                        region_name="us-east-1",
+                    )
+                )
+                _s3_clients[endpoint_url] = client
+    return client
+
+
+async def close_s3_clients() -> None:
+    """Close the shared S3 clients; called at shutdown."""
+    await _s3_clients_stack.aclose()
+    _s3_clients.clear()
+
+
+# Pipeline components are built once and shared by every processing task;
+# the embedder (model + Chroma client) is shared with the agent's tools too.
+@lru_cache(maxsize=1)
+def _extractor() -> DocumentExtractor:
+    return DocumentExtractor()
+
+
+@lru_cache(maxsize=1)
+def _structured() -> StructuredExtractor:
+    return StructuredExtractor(settings)
+
+
+@lru_cache(maxsize=1)
+def _chunker() -> DocumentChunker:
+    return DocumentChunker()
+
+
+_bucket_ready = False
+_bucket_lock = asyncio.Lock()
+
+
+async def ensure_bucket(s3) -> None:
+    """Create the documents bucket if needed, checking S3 only once per process."""
+    global _bucket_ready
+    if _bucket_ready:
+        return
+    async with _bucket_lock:
+        if _bucket_ready:
+            return
+        try:
+            await s3.head_bucket(Bucket=settings.s3_bucket)
+        except Exception:
+            await s3.create_bucket(Bucket=settings.s3_bucket)
+        _bucket_ready = True
+
+
+_arq_pool = None
+_arq_pool_lock = asyncio.Lock()
+
+
+async def _get_arq_pool():
+    global _arq_pool
+    if _arq_pool is None:
+        async with _arq_pool_lock:
+            if _arq_pool is None:
+                from arq import create_pool
+                from arq.connections import RedisSettings
+
+                _arq_pool = await create_pool(RedisSettings.from_dsn(settings.redis_url))
+    return _arq_pool
+
+
+async def enqueue_processing(
+    background_tasks: BackgroundTasks, doc_id: str, s3_key: str, filename: str, file_type: str
+) -> bool:
+    """Schedule process_document for a stored upload.
+
+    With REDIS_URL set the job goes to the arq queue and runs on a separate
+    worker (``arq backend.worker.WorkerSettings``); otherwise it runs in this
+    process as a FastAPI background task after the response is sent.
+
+    Documents are committed as "processing" before this runs, so if the job
+    can't be queued the document is marked "error" rather than left
+    processing forever.
+
+    Returns:
+        True if processing was scheduled, False if the document was marked as errored.
+    """
+    if not settings.redis_url:
+        background_tasks.add_task(process_document, doc_id, s3_key, filename, file_type)
+        return True
+    try:
+        pool = await _get_arq_pool()
+        await pool.enqueue_job(
+            "process_document", doc_id, s3_key, filename, file_type, _job_id=f"process:{doc_id}"
+        )
+    except Exception as e:
+        logger.error("Failed to queue processing for document %s: %s", doc_id, e)
+        await _update_document(uuid.UUID(doc_id), processing_status="error")
+        return False
+    return True
+
+
+async def _update_document(doc_id: uuid.UUID, **values) -> None:
+    """Set columns on a document with a single UPDATE, without loading the row."""
+    async with async_session() as db:
+        await db.execute(update(Document).where(Document.id == doc_id).values(**values))
+        await db.commit()
 
 
 async def process_document(doc_id: str, s3_key: str, filename: str, file_type: str):
     """Background task: download from S3, extract text, chunk, embed, store metadata."""
+    doc_uuid = uuid.UUID(doc_id)
     try:
-        async with async_session() as db:
-            # Update status to processing
-            result = await db.execute(select(Document).where(Document.id == uuid.UUID(doc_id)))
-            doc = result.scalar_one()
-            doc.processing_status = "processing"
-            await db.commit()
-
         # Download from S3 to temp file
-        s3 = get_s3_client()
+        s3 = await get_s3_client()
         with tempfile.NamedTemporaryFile(suffix=f".{file_type}", delete=False) as tmp:
-            s3.download_fileobj(settings.s3_bucket, s3_key, tmp)
+            await s3.download_fileobj(settings.s3_bucket, s3_key, tmp)
             tmp_path = Path(tmp.name)
 
         try:
-            # Step 1: Extract text
-            extractor = DocumentExtractor()
-            raw_text = extractor.extract_text(tmp_path, file_type)
+            # Step 1: Extract text (PDF pages without blocking the event loop)
+            extractor = _extractor()
+            if file_type == "pdf":
+                extractor.validate_file(tmp_path, file_type)
+                raw_text = extractor.join_pages(await extractor.aextract_pdf_pages(tmp_path))
+            else:
+                raw_text = extractor.extract_text(tmp_path, file_type)
 
             # Step 2: Detect document type and extract structured data
-            structured = StructuredExtractor(settings)
-            doc_type = structured.detect_document_type(raw_text)
-            extracted_data = structured.extract(raw_text, doc_type)
+            structured = _structured()
+            doc_type, extracted_data = await structured.classify_and_extract(raw_text)
 
             # Step 3: Chunk the text
-            chunker = DocumentChunker()
-            chunks = chunker.chunk_document(raw_text, doc_id, doc_type)
+            chunks = _chunker().chunk_document(raw_text, doc_id, doc_type)
 
             # Step 4: Embed and store in ChromaDB
-            embedder = DocumentEmbedder(settings)
+            embedder = get_embedder()
             embedder.store_chunks(chunks, doc_id)
 
             # Step 5: Update database record
-            async with async_session() as db:
-                result = await db.execute(select(Document).where(Document.id == uuid.UUID(doc_id)))
-                doc = result.scalar_one()
-                doc.processing_status = "completed"
-                doc.doc_type = doc_type
-                doc.extracted_data = extracted_data
-                await db.commit()
+            await _update_document(
+                doc_uuid,
+                processing_status="completed",
+                doc_type=doc_type,
+                extracted_data=extracted_data,
+            )
 
             logger.info("Document %s processed successfully", doc_id)
         finally:
@@ -98,12 +242,18 @@ async def process_document(doc_id: str, s3_key: str, filename: str, file_type: s
 
     except Exception as e:
         logger.error("Failed to process document %s: %s", doc_id, e)
-        async with async_session() as db:
-            result = await db.execute(select(Document).where(Document.id == uuid.UUID(doc_id)))
-            doc = result.scalar_one_or_none()
-            if doc:
-                doc.processing_status = "error"
-                await db.commit()
+        await _update_document(doc_uuid, processing_status="error")
+
+
+def _validate_extension(filename: str | None) -> str:
+    """Return the lowercased file extension, or raise 400 if it is not allowed."""
+    ext = filename.rsplit(".", 1)[-1].lower() if filename and "." in filename else ""
+    if ext not in settings.allowed_extensions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type '{ext}' not allowed. Allowed: {settings.allowed_extensions}",
+        )
+    return ext
 
 
 @router.post("/upload", response_model=DocumentResponse, status_code=status.HTTP_201_CREATED)
@@ -113,62 +263,176 @@ async def upload_document(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(interaction_guard),
 ):
-    # Validate extension
-    ext = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else ""
-    if ext not in settings.allowed_extensions:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type '{ext}' not allowed. Allowed: {settings.allowed_extensions}",
-        )
+    ext = _validate_extension(file.filename)
 
-    # Validate size
-    contents = await file.read()
-    size_mb = len(contents) / (1024 * 1024)
-    if size_mb > settings.max_file_size_mb:
+    # The multipart parser has already spooled the upload (to disk past
+    # 1 MB), so it is sized and streamed to S3 from there without a copy
+    size = file.size if file.size is not None else file.file.seek(0, os.SEEK_END)
+    if size > settings.max_file_size_mb * 1024 * 1024:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File size {size_mb:.1f}MB exceeds limit of {settings.max_file_size_mb}MB",
+            detail=f"File size {size / (1024 * 1024):.1f}MB exceeds limit of {settings.max_file_size_mb}MB",
         )
+    await file.seek(0)
 
     # Upload to MinIO/S3
     doc_id = uuid.uuid4()
     s3_key = f"uploads/{doc_id}/{file.filename}"
 
-    s3 = get_s3_client()
     try:
-        # Ensure bucket exists
-        try:
-            s3.head_bucket(Bucket=settings.s3_bucket)
-        except Exception:
-            s3.create_bucket(Bucket=settings.s3_bucket)
-
-        s3.put_object(Bucket=settings.s3_bucket, Key=s3_key, Body=contents)
+        s3 = await get_s3_client()
+        await ensure_bucket(s3)
+        await s3.upload_fileobj(file.file, settings.s3_bucket, s3_key, Config=TRANSFER_CONFIG)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to upload to storage: {str(e)}",
         )
 
-    # Create DB record with processing status
+    # Create DB record already marked processing: the job is scheduled in the
+    # same request, so this commit replaces a separate status UPDATE
     document = Document(
         id=doc_id,
         filename=file.filename,
         file_type=ext,
         s3_key=s3_key,
         upload_timestamp=datetime.utcnow(),
-        processing_status="pending",
+        processing_status="processing",
         user_id=str(current_user.id),
     )
     db.add(document)
     await increment_interaction(current_user, db)
-    await db.refresh(document)
 
     # Kick off background processing
-    background_tasks.add_task(process_document, str(doc_id), s3_key, file.filename, ext)
+    if not await enqueue_processing(background_tasks, str(doc_id), s3_key, file.filename, ext):
+        document.processing_status = "error"
 
     return DocumentResponse.model_validate(document)
 
 
+@router.post("/initiate-upload", response_model=UploadInitResponse, status_code=status.HTTP_201_CREATED)
+async def initiate_upload(
+    request: UploadInitRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(interaction_guard),
+):
+    """Start a direct-to-storage upload.
+
+    Returns a presigned POST (url + form fields) the client sends the file to,
+    so the bytes never pass through the API. The client then calls
+    complete-upload to start processing.
+    """
+    ext = _validate_extension(request.filename)
+    doc_id = uuid.uuid4()
+    s3_key = f"uploads/{doc_id}/{request.filename}"
+
+    # Drop this user's abandoned initiations; committed with the new row
+    await db.execute(
+        delete(Document).where(
+            Document.user_id == str(current_user.id),
+            Document.processing_status == "awaiting_upload",
+            Document.upload_timestamp < datetime.utcnow() - STALE_UPLOAD_AFTER,
+        )
+    )
+
+    await ensure_bucket(await get_s3_client())
+    presigner = await get_s3_client(settings.s3_public_endpoint)
+    presigned = await presigner.generate_presigned_post(
+        settings.s3_bucket,
+        s3_key,
+        Conditions=[["content-length-range", 1, settings.max_file_size_mb * 1024 * 1024]],
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRY_SECONDS,
+    )
+
+    document = Document(
+        id=doc_id,
+        filename=request.filename,
+        file_type=ext,
+        s3_key=s3_key,
+        upload_timestamp=datetime.utcnow(),
+        processing_status="awaiting_upload",
+        user_id=str(current_user.id),
+    )
+    db.add(document)
+    await db.commit()
+
+    return UploadInitResponse(
+        document_id=doc_id, s3_key=s3_key, url=presigned["url"], fields=presigned["fields"]
+    )
+
+
+@router.post("/complete-upload/{document_id}", response_model=DocumentResponse)
+async def complete_upload(
+    document_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(interaction_guard),
+):
+    """Confirm a presigned upload landed in storage and start processing it."""
+    result = await db.execute(
+        select(Document).where(
+            Document.id == document_id, Document.user_id == str(current_user.id)
+        )
+    )
+    document = result.scalar_one_or_none()
+    if not document:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
+    if document.processing_status != "awaiting_upload":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+
+    s3 = await get_s3_client()
+    try:
+        await s3.head_object(Bucket=settings.s3_bucket, Key=document.s3_key)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File has not been uploaded to storage",
+        )
+
+    document.processing_status = "processing"
+    await increment_interaction(current_user, db)
+    if not await enqueue_processing(
+        background_tasks, str(document.id), document.s3_key, document.filename, document.file_type
+    ):
+        document.processing_status = "error"
+
+    return DocumentResponse.model_validate(document)
+
+
+async def _ensure_sample(s3, fname: str) -> None:
+    """Upload one sample file under samples/ unless it is already in the bucket."""
+    s3_key = f"samples/{fname}"
+    try:
+        await s3.head_object(Bucket=settings.s3_bucket, Key=s3_key)
+    except Exception:
+        local_path = _SAMPLE_DATA_DIR / fname
+        if not local_path.exists():
+            raise FileNotFoundError(f"Sample file {fname} not found on server.")
+        await s3.upload_file(str(local_path), settings.s3_bucket, s3_key)
+
+
+_samples_seeded = False
+_samples_lock = asyncio.Lock()
+
+
+async def seed_sample_documents() -> None:
+    """Make sure every sample file is in the bucket, checking S3 only once per process.
+
+    Run at startup so /load-samples only has to insert rows; the endpoint
+    still calls it in case startup seeding failed.
+    """
+    global _samples_seeded
+    if _samples_seeded:
+        return
+    async with _samples_lock:
+        if _samples_seeded:
+            return
+        s3 = await get_s3_client()
+        await ensure_bucket(s3)
+        await asyncio.gather(*(_ensure_sample(s3, fname) for fname in SAMPLE_FILENAMES))
+        _samples_seeded = True
+
+
 @router.post("/load-samples", response_model=list[DocumentResponse], status_code=status.HTTP_201_CREATED)
 async def load_sample_documents(
     background_tasks: BackgroundTasks,
@@ -178,13 +442,14 @@ async def load_sample_documents(
     """Load 5 pre-built sample financial documents for the current user."""
     # Check if user already loaded samples
     result = await db.execute(
-        select(Document).where(
+        select(Document.id)
+        .where(
             Document.user_id == str(current_user.id),
             Document.filename.in_(SAMPLE_FILENAMES),
         )
+        .limit(1)
     )
-    existing = result.scalars().all()
-    if existing:
+    if result.first() is not None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Sample documents have already been loaded.",
@@ -198,27 +463,14 @@ async def load_sample_documents(
             detail=f"Not enough interactions remaining ({remaining}) to load {len(SAMPLE_FILENAMES)} sample documents.",
         )
 
-    s3 = get_s3_client()
-
-    # Ensure bucket exists
+    # Normally a no-op: the samples were seeded at startup
     try:
-        s3.head_bucket(Bucket=settings.s3_bucket)
-    except Exception:
-        s3.create_bucket(Bucket=settings.s3_bucket)
-
-    # Upload samples to S3 under samples/ prefix if not already present
-    for fname in SAMPLE_FILENAMES:
-        s3_key = f"samples/{fname}"
-        try:
-            s3.head_object(Bucket=settings.s3_bucket, Key=s3_key)
-        except Exception:
-            local_path = _SAMPLE_DATA_DIR / fname
-            if not local_path.exists():
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Sample file {fname} not found on server.",
-                )
-            s3.upload_file(str(local_path), settings.s3_bucket, s3_key)
+        await seed_sample_documents()
+    except FileNotFoundError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e),
+        )
 
     # Create Document records and kick off processing
     created_docs = []
@@ -233,7 +485,7 @@ async def load_sample_documents(
             file_type=ext,
             s3_key=s3_key,
             upload_timestamp=datetime.utcnow(),
-            processing_status="pending",
+            processing_status="processing",
             user_id=str(current_user.id),
         )
         db.add(document)
@@ -243,11 +495,12 @@ async def load_sample_documents(
     current_user.interaction_count += len(SAMPLE_FILENAMES)
     await db.commit()
 
-    # Refresh and schedule background processing
+    # Schedule background processing; every response field is already set
+    # locally, so the committed documents need no refresh
     responses = []
     for document, doc_id, s3_key, fname, ext in created_docs:
-        await db.refresh(document)
-        background_tasks.add_task(process_document, doc_id, s3_key, fname, ext)
+        if not await enqueue_processing(background_tasks, doc_id, s3_key, fname, ext):
+            document.processing_status = "error"
         responses.append(DocumentResponse.model_validate(document))
 
     return responses
@@ -258,10 +511,22 @@ async def list_documents(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    # lambda_stmt caches the built and compiled SELECT; user_id and the
+    # cutoff become bind parameters
+    user_id = str(current_user.id)
+    stale_before = datetime.utcnow() - STALE_UPLOAD_AFTER
     result = await db.execute(
-        select(Document)
-        .where(Document.user_id == str(current_user.id))
-        .order_by(Document.upload_timestamp.desc())
+        lambda_stmt(
+            lambda: select(Document)
+            .where(
+                Document.user_id == user_id,
+                or_(
+                    Document.processing_status != "awaiting_upload",
+                    Document.upload_timestamp >= stale_before,
+                ),
+            )
+            .order_by(Document.upload_timestamp.desc())
+        )
     )
     documents = result.scalars().all()
     return [DocumentResponse.model_validate(doc) for doc in documents]
@@ -273,7 +538,9 @@ async def get_document(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    result = await db.execute(select(Document).where(Document.id == document_id))
+    result = await db.execute(
+        lambda_stmt(lambda: select(Document).where(Document.id == document_id))
+    )
     document = result.scalar_one_or_none()
     if not document:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document not found")
@@ -1,18 +1,33 @@
+import hashlib
 import uuid
 import logging
+from datetime import datetime
 
+import orjson
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
-from sqlalchemy import select
+from fastapi.responses import StreamingResponse
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.cache import LRUCache
 from backend.middleware.auth import get_current_user, interaction_guard, increment_interaction
 from backend.models.database import Report, User, get_db, async_session
 from backend.models.schemas import ReportRequest, ReportResponse
-from backend.reports.generator import ReportGenerator
+from backend.reports.generator import ReportGenerator, render_to_pdf_async
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 logger = logging.getLogger(__name__)
 
+# Rendered PDF exports keyed by (report_id, "pdf"). A completed report's data
+# never changes (regenerating creates a new report), so entries never go stale.
+_export_cache = LRUCache(maxsize=64)
+
+
+def _params_hash(report_type: str, parameters: dict) -> str:
+    """Hash a report request, independent of parameter key order."""
+    canonical = orjson.dumps([report_type, parameters], option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.sha256(canonical).hexdigest()
+
 
 async def generate_report_task(report_id: str, report_type: str, parameters: dict):
     """Background task to generate a report."""
@@ -57,20 +72,36 @@ async def generate_report(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(interaction_guard),
 ):
+    parameters = request.parameters or {}
+    params_hash = _params_hash(request.report_type, parameters)
+
+    # Identical requests produce identical reports, so reuse a completed one
+    result = await db.execute(
+        select(Report.data)
+        .where(Report.params_hash == params_hash, Report.status == "completed")
+        .limit(1)
+    )
+    previous = result.first()
+    data = {}
+    if previous is not None:
+        # The copy is a new report, so it is stamped with today's date
+        data = {**previous.data, "generated_at": datetime.now().isoformat()}
+
     report_id = uuid.uuid4()
     report = Report(
         id=report_id,
         report_type=request.report_type,
-        data={},
-        status="generating",
+        data=data,
+        status="completed" if previous else "generating",
+        params_hash=params_hash,
     )
     db.add(report)
     await increment_interaction(current_user, db)
-    await db.refresh(report)
 
-    background_tasks.add_task(
-        generate_report_task, str(report_id), request.report_type, request.parameters or {}
-    )
+    if previous is None:
+        background_tasks.add_task(
+            generate_report_task, str(report_id), request.report_type, parameters
+        )
 
     return ReportResponse.model_validate(report)
 
@@ -81,7 +112,7 @@ async def get_report(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    result = await db.execute(select(Report).where(Report.id == report_id))
+    result = await db.execute(lambda_stmt(lambda: select(Report).where(Report.id == report_id)))
     report = result.scalar_one_or_none()
     if not report:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
@@ -95,20 +126,19 @@ async def export_report(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    result = await db.execute(select(Report).where(Report.id == report_id))
+    result = await db.execute(lambda_stmt(lambda: select(Report).where(Report.id == report_id)))
     report = result.scalar_one_or_none()
     if not report:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
     if report.status != "completed":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Report is not yet completed")
 
-    generator = ReportGenerator()
     report_type = report.report_type
 
     if format == "csv":
-        csv_bytes = generator.export_to_csv(report.data)
-        return Response(
-            content=csv_bytes,
+        # Streamed in row batches rather than built up in memory first
+        return StreamingResponse(
+            ReportGenerator().iter_csv(report.data),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename={report_type}_{report_id}.csv"},
         )
@@ -121,10 +151,14 @@ async def export_report(
             "cashflow": "cashflow",
         }
         template = template_map.get(report_type, "gst_summary")
+        cache_key = (report_id, "pdf")
+        content = _export_cache.get(cache_key)
         try:
-            pdf_bytes = generator.render_to_pdf(report.data, template)
+            if content is None:
+                content = await render_to_pdf_async(report.data, template)
+                _export_cache.set(cache_key, content)
             return Response(
-                content=pdf_bytes,
+                content=content,
                 media_type="application/pdf",
                 headers={"Content-Disposition": f"attachment; filename={report_type}_{report_id}.pdf"},
             )
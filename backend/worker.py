@@ -0,0 +1,26 @@
+"""arq worker for document processing.
+
+Run with ``arq backend.worker.WorkerSettings`` alongside the API when
+REDIS_URL is set; the API then enqueues uploads here instead of processing
+them in-process.
+"""
+
+from arq import func
+from arq.connections import RedisSettings
+
+from backend.config import get_settings
+from backend.routers.documents import process_document
+
+settings = get_settings()
+
+
+async def process_document_job(
+    ctx: dict, doc_id: str, s3_key: str, filename: str, file_type: str
+) -> None:
+    await process_document(doc_id, s3_key, filename, file_type)
+
+
+class WorkerSettings:
+    functions = [func(process_document_job, name="process_document", timeout=15 * 60)]
+    redis_settings = RedisSettings.from_dsn(settings.redis_url or "redis://localhost:6379")
+    max_jobs = 5
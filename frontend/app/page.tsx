@@ -114,13 +114,18 @@ export default function ChatPage() {
         setIsStreaming(false);
         setMessages((prev) =>
           prev.map((m) =>
-            m.id === chunk.message_id ? { ...m, streaming: false } : m
+            m.id === chunk.message_id
+              ? { ...m, streaming: false, citations: chunk.citations ?? m.citations }
+              : m
           )
         );
         refreshUser();
         return;
       }
 
+      setIsThinking(false);
+      setThinkingSteps([]);
+      setIsStreaming(true);
       setMessages((prev) => {
         const existing = prev.find((m) => m.id === chunk.message_id);
         if (existing) {
@@ -44,6 +44,13 @@ function getStatusBadge(status: string) {
           Processing
         </span>
       );
+    case "awaiting_upload":
+      return (
+        <span className="inline-flex items-center gap-1 rounded-full bg-neutral-100 px-2.5 py-0.5 text-xs font-medium text-neutral-500">
+          <Clock className="h-3 w-3" />
+          Uploading
+        </span>
+      );
     case "error":
       return (
         <span className="inline-flex items-center gap-1 rounded-full bg-neutral-100 px-2.5 py-0.5 text-xs font-medium text-neutral-500">
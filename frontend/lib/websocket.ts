@@ -15,7 +15,12 @@ export interface ChatMessage {
 }
 
 type MessageHandler = (message: ChatMessage) => void;
-type StreamHandler = (chunk: { message_id: string; content: string; done: boolean }) => void;
+type StreamHandler = (chunk: {
+  message_id: string;
+  content: string;
+  done: boolean;
+  citations?: ChatMessage["citations"];
+}) => void;
 type ThinkingHandler = (step: { tool: string; content: string }) => void;
 type StatusHandler = (status: "connected" | "disconnected" | "reconnecting") => void;
 
@@ -69,14 +74,27 @@ export class WebSocketClient {
                 message_id: data.message_id,
                 content: data.content,
                 done: data.done || false,
+                citations: data.citations,
               })
             );
           } else if (data.type === "thinking") {
             this.thinkingHandlers.forEach((handler) =>
               handler({ tool: data.tool, content: data.content })
             );
+          } else if (data.type === "thinking_batch") {
+            for (const step of data.steps) {
+              this.thinkingHandlers.forEach((handler) =>
+                handler({ tool: step.tool, content: step.content })
+              );
+            }
           } else if (data.type === "message") {
-            this.messageHandlers.forEach((handler) => handler(data.message));
+            // The server sends epoch milliseconds; handlers get an ISO string
+            const { timestamp_ms, ...rest } = data.message;
+            const message: ChatMessage = {
+              ...rest,
+              timestamp: new Date(timestamp_ms ?? Date.now()).toISOString(),
+            };
+            this.messageHandlers.forEach((handler) => handler(message));
           }
         } catch {
           // Non-JSON message, ignore